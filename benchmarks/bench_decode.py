@@ -0,0 +1,62 @@
+""" Per-frame decoding cost, replaying recorded frames
+
+    python benchmarks/bench_decode.py [frames.jsonl]
+
+frames.jsonl holds one {"frame": "<raw RPC frame>"} object per line. Without
+it, a synthetic crosstalk recording is used.
+"""
+import json
+import sys
+
+from common import make_connector, measure, sample_frames
+from PyQt6.QtCore import QCoreApplication
+
+from discord_overlay.libs import rpc_json
+
+
+def load_frames(path: str) -> list:
+    with open(path, encoding="utf-8") as frames_file:
+        return [json.loads(line)["frame"] for line in frames_file if line.strip()]
+
+
+def decode_stdlib(frames: list) -> None:
+    for frame in frames:
+        json.loads(frame)
+
+
+def decode_backend(frames: list) -> None:
+    for frame in frames:
+        rpc_json.loads(frame)
+
+
+def decode_classified(frames: list) -> None:
+    for frame in frames:
+        if not rpc_json.classify_speaking_frame(frame):
+            json.loads(frame)
+
+
+def main() -> None:
+    app = QCoreApplication([])  # noqa: F841
+    frames = load_frames(sys.argv[1]) if len(sys.argv) > 1 else sample_frames()
+    print(f"{len(frames)} frames, JSON backend: {rpc_json.JSON_BACKEND}")
+
+    connector = make_connector()
+
+    def dispatch(frames):
+        for frame in frames:
+            connector.on_message(frame)
+
+    cases = {
+        "json.loads": decode_stdlib,
+        f"{rpc_json.JSON_BACKEND}.loads": decode_backend,
+        # What on_message does without orjson, see rpc_json.CLASSIFY_SPEAKING_FRAMES
+        "classify + json": decode_classified,
+        "on_message": dispatch,
+    }
+    for name, function in cases.items():
+        seconds = measure(lambda: function(frames), iterations=5)
+        print(f"{name:<20} {seconds / len(frames) * 1e6:>8.2f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+""" Messages per second through QDiscordWebSocket.on_message
+
+    python benchmarks/bench_dispatch.py
+"""
+import logging
+
+from common import make_connector, measure, sample_frames, speaking_frame, voice_state_frame
+from PyQt6.QtCore import QCoreApplication
+
+
+def main() -> None:
+    app = QCoreApplication([])  # noqa: F841
+    logging.basicConfig(level=logging.INFO)
+    connector = make_connector()
+
+    cases = {
+        "SPEAKING_START": [speaking_frame("100000000000000001", start=True)],
+        "VOICE_STATE_UPDATE": [voice_state_frame("100000000000000001")],
+        "mixed crosstalk": sample_frames(),
+    }
+    for name, frames in cases.items():
+        def run():
+            for frame in frames:
+                connector.on_message(frame)
+
+        seconds = measure(run, iterations=max(1, 20000 // len(frames)))
+        print(f"{name:<20} {len(frames) / seconds:>12,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
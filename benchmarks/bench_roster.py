@@ -0,0 +1,109 @@
+""" Memory and frame time of the two roster views
+
+    python benchmarks/bench_roster.py
+
+Every configuration runs in its own process so the memory figures do not
+add up. The frame is the repaint of a 300x400 viewport after a speaking
+change, the full frame repaints the whole viewport. The widgets column counts
+the UserWidget instances alive once the roster is shown. The last columns
+load the whole channel again, one user at a time like the VOICE_STATE_UPDATE
+events do, then at once like on channel join.
+"""
+import logging
+import subprocess
+import sys
+import time
+
+from common import add_users, make_controller, measure, peak_rss_mb
+from PyQt6.QtWidgets import QApplication
+
+USER_COUNTS = (10, 100, 500)
+VIEWS = ("widgets", "painted")
+
+
+def run_child(view: str, count: int) -> None:
+    from discord_overlay.widgets.main.central.roster_view import RosterView
+    from discord_overlay.widgets.main.central.scroll_area import CentralWidgetScrollArea
+
+    app = QApplication([])
+    logging.basicConfig(level=logging.WARNING)
+    controller = make_controller()
+    roster_class = RosterView if view == "painted" else CentralWidgetScrollArea
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    roster = roster_class(controller=controller)
+    roster.resize(300, 400)
+    users = add_users(controller, count)
+    roster.show()
+    app.processEvents()
+    build = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+
+    # The ScrollAreaUserContainer owns the speaking helpers of the widgets view
+    container = getattr(roster, "user_container", roster)
+    speaker = container.speaking_coalescer
+    widgets = len(getattr(container, "bound_widgets", ())) + len(getattr(container, "free_widgets", ()))
+    # The last user added is shown first
+    user_id = users[-1].id
+    speaking = iter(range(1_000_000))
+
+    def speaking_frame():
+        speaker.push(user_id, next(speaking) % 2 == 0, time.perf_counter())
+        speaker.flush()
+        roster.viewport().repaint()
+
+    def full_frame():
+        roster.viewport().repaint()
+
+    def join_one_by_one():
+        controller.model.empty_users()
+        for user in users:
+            controller.model.add_user(user)
+        app.processEvents()
+
+    def join_at_once():
+        controller.model.empty_users()
+        controller.model.reset_users(users)
+        app.processEvents()
+
+    print(
+        view,
+        count,
+        rss_after - rss_before if rss_before is not None else "n/a",
+        build * 1000,
+        widgets,
+        measure(speaking_frame, 50) * 1000,
+        measure(full_frame, 50) * 1000,
+        measure(join_one_by_one, 1) * 1000,
+        measure(join_at_once, 1) * 1000,
+    )
+
+
+def main() -> None:
+    print(
+        f"{'view':<8} {'users':>6} {'memory':>10} {'build':>10} {'widgets':>8} {'speaking':>10} "
+        f"{'full frame':>10} {'one by one':>10} {'at once':>10}"
+    )
+    for count in USER_COUNTS:
+        for view in VIEWS:
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", view, str(count)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            name, users, memory, build, widgets, speaking, full, one_by_one, at_once = result.stdout.split()
+            memory = f"{float(memory):>8.1f}MB" if memory != "n/a" else f"{memory:>10}"
+            print(
+                f"{name:<8} {users:>6} {memory} {float(build):>8.1f}ms {widgets:>8} "
+                f"{float(speaking):>8.2f}ms {float(full):>8.2f}ms "
+                f"{float(one_by_one):>8.1f}ms {float(at_once):>8.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        run_child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
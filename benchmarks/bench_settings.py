@@ -0,0 +1,69 @@
+""" Cost of a settings change depending on the number of users
+
+    python benchmarks/bench_settings.py
+
+Compares the container stylesheet with the former per widget setStyleSheet.
+"""
+import logging
+
+from common import add_users, make_controller, measure
+from PyQt6.QtWidgets import QApplication
+
+USER_COUNTS = (10, 100, 500)
+COLORS = ("white", "yellow")
+
+
+def per_widget_style(container, color: str) -> None:
+    """ What a nickname color change used to cost: one stylesheet per user widget
+    """
+    for widget in container.bound_widgets.values():
+        widget.nick_label.setStyleSheet(f"""
+            QLabel[cssClass="UserWidgetNickLabel"] {{
+                color: {color};
+                font-size: 12px;
+                padding-left: 2px;
+            }}
+        """)
+
+
+def main() -> None:
+    from discord_overlay.widgets.main.central.scroll_area import CentralWidgetScrollArea
+
+    app = QApplication([])
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"{'users':>6} {'container':>12} {'per widget':>12}")
+    for count in USER_COUNTS:
+        controller = make_controller()
+        # Like the overlay: only the rows inside the viewport get painted
+        scroll_area = CentralWidgetScrollArea(controller=controller)
+        scroll_area.resize(300, 400)
+        container = scroll_area.user_container
+        add_users(controller, count)
+        scroll_area.show()
+        app.processEvents()
+
+        changes = iter(range(1_000_000))
+
+        def change_setting():
+            color = COLORS[next(changes) % 2]
+            controller.config.set("user_nickname_color", color)
+            controller.settings_changed_signal.emit("user_nickname_color")
+            app.processEvents()
+
+        def change_per_widget():
+            per_widget_style(container, COLORS[next(changes) % 2])
+            app.processEvents()
+
+        iterations = max(2, 2000 // count)
+        shared = measure(change_setting, iterations)
+        per_widget = measure(change_per_widget, iterations)
+        print(f"{count:>6} {shared * 1000:>10.2f}ms {per_widget * 1000:>10.2f}ms")
+
+        container.remove_users()
+        scroll_area.deleteLater()
+        controller.config.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+""" Helpers shared by the benchmarks
+
+The benchmarks run without a Discord client and without a display:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_dispatch.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from types import SimpleNamespace
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Never touch the user settings
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp(prefix="discord-overlay-bench-")
+
+BENCH_DOMAIN = "bench.discord-overlay"
+BENCH_NAME = "bench"
+
+# The Discord client sends compact JSON
+dumps = partial(json.dumps, separators=(",", ":"))
+
+
+def make_connector():
+    """ A QDiscordWebSocket that never opens nor sends anything
+    """
+    from discord_overlay.config import Config
+    from discord_overlay.libs.QDiscordWebSocket import QDiscordWebSocket
+
+    controller = SimpleNamespace(
+        config=Config(BENCH_DOMAIN, BENCH_NAME),
+        load_access_token=lambda: None,
+    )
+    connector = QDiscordWebSocket(controller=controller)
+    connector.sendTextMessage = lambda message: None
+    connector.user = {"id": "0", "username": "bench"}
+    return connector
+
+
+def make_controller():
+    """ A Controller that never connects to Discord nor sends notifications
+    """
+    from discord_overlay.config import Config
+    from discord_overlay.controller import Controller
+    from discord_overlay.libs.QDiscordWebSocket import QDiscordWebSocket
+    from discord_overlay.model import Model
+
+    QDiscordWebSocket.open_ = lambda self: None
+    controller = Controller(model=Model(), config=Config(BENCH_DOMAIN, BENCH_NAME))
+    controller.discord_connector.user = {"id": "0", "username": "bench"}
+    controller.someone_joined_channel_notification = lambda user_widget: None
+    controller.someone_left_channel_notification = lambda user_widget, send_toast=True: None
+    return controller
+
+
+def avatar_png(size: int = 64) -> bytes:
+    from PyQt6.QtCore import QBuffer, QIODevice
+    from PyQt6.QtGui import QColor, QImage
+
+    image = QImage(size, size, QImage.Format.Format_ARGB32)
+    image.fill(QColor("steelblue"))
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def voice_user(user_id: str):
+    """ A user as stored in the Model
+    """
+    from discord_overlay.model import VoiceUser
+
+    return VoiceUser(user_id=user_id, nick=f"User {user_id}", avatar=f"{int(user_id):032x}")
+
+
+def add_users(controller, count: int) -> list:
+    """ Add users to the model, their avatars already in the cache
+    """
+    from discord_overlay.libs.avatar_cache import avatar_cache_key
+
+    png = avatar_png()
+    users = [voice_user(str(100000000000000000 + index)) for index in range(count)]
+    for user in users:
+        controller.avatar_cache.put(avatar_cache_key(user), png)
+        controller.model.add_user(user)
+    return users
+
+
+def voice_state_frame(user_id: str, mute: bool = False) -> str:
+    return dumps({
+        "cmd": "DISPATCH",
+        "evt": "VOICE_STATE_UPDATE",
+        "data": {
+            "nick": f"user{user_id}",
+            "mute": False,
+            "volume": 100,
+            "pan": {"left": 1.0, "right": 1.0},
+            "voice_state": {
+                "mute": mute, "deaf": False, "self_mute": False, "self_deaf": False, "suppress": False,
+            },
+            "user": {
+                "id": user_id,
+                "username": f"user{user_id}",
+                "discriminator": "0",
+                "global_name": f"User {user_id}",
+                "avatar": f"{int(user_id):032x}",
+                "avatar_decoration_data": None,
+                "bot": False,
+                "flags": 0,
+                "premium_type": 0,
+            },
+        },
+        "nonce": None,
+    })
+
+
+def speaking_frame(user_id: str, start: bool) -> str:
+    return dumps({
+        "cmd": "DISPATCH",
+        "data": {"channel_id": "1000", "user_id": user_id},
+        "evt": "SPEAKING_START" if start else "SPEAKING_STOP",
+        "nonce": None,
+    })
+
+
+def sample_frames(users: int = 25, rounds: int = 40) -> list:
+    """ Crosstalk heavy traffic: mostly SPEAKING_*, some voice state updates
+    """
+    frames = []
+    for round_ in range(rounds):
+        for user in range(users):
+            user_id = str(100000000000000000 + user)
+            frames.append(speaking_frame(user_id, start=True))
+            frames.append(speaking_frame(user_id, start=False))
+            if (round_ + user) % 10 == 0:
+                frames.append(voice_state_frame(user_id, mute=bool(round_ % 2)))
+    return frames
+
+
+def measure(function, iterations: int) -> float:
+    """ Best of 5 runs, in seconds per iteration
+    """
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        timings.append((time.perf_counter() - start) / iterations)
+    return min(timings)
+
+
+def peak_rss_mb() -> float | None:
+    """ Peak resident memory of the process in MB, None when it cannot be read
+
+    resource is missing on Windows, where psutil is used if it is installed.
+    ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+
+        memory = psutil.Process().memory_info()
+        # peak_wset only exists on Windows
+        return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
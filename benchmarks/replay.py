@@ -0,0 +1,125 @@
+""" Replay recorded Discord frames through the overlay, without Discord nor display
+
+    discord-overlay --record-frames session.jsonl
+    python benchmarks/replay.py session.jsonl [--realtime] [--view painted]
+
+The frames go through QDiscordWebSocket.on_message into the Controller,
+the Model and the users list of a MainWidget, nothing is sent back and
+avatars are never downloaded. Without a recording, a synthetic one is
+replayed: a channel of 25 users joined at once, then the crosstalk of
+common.sample_frames(), one frame per millisecond.
+
+At full speed the speaking coalescer is flushed after every frame, its
+timer would otherwise merge every start/stop pair and skip the widgets.
+With --realtime it runs on its own timer, like in the overlay.
+
+Reports the events per second, the GUI thread CPU time per event, which
+leaves out the time spent waiting in --realtime, the speaking changes
+applied to the users list or dropped by the coalescer, and the peak RSS.
+"""
+import argparse
+import json
+import logging
+import time
+
+from common import avatar_png, dumps, make_controller, peak_rss_mb, sample_frames, voice_state_frame
+from PyQt6.QtWidgets import QApplication
+
+# Time left to the hide and layout timers once every frame is replayed, not measured
+DRAIN_SECONDS = 0.1
+
+
+def make_overlay(view: str):
+    from discord_overlay.widgets.main import MainWidget
+
+    controller = make_controller()
+    controller.config.set("roster_view", view)
+    connector = controller.discord_connector
+    # The replies are already in the recording, and the token exchange needs the network
+    connector.sendTextMessage = lambda message: None
+    connector.get_access_token_stage2 = lambda code: None
+    png = avatar_png()
+    controller.avatar_fetcher.fetch = lambda url, cache_key, callback: callback(png)
+    main_widget = MainWidget(controller=controller)
+    main_widget.show()
+    return controller, main_widget
+
+
+def synthetic_recording(channel_type: int, users: int = 25) -> list:
+    user_ids = [str(100000000000000000 + user) for user in range(users)]
+    channel = dumps({
+        "cmd": "GET_CHANNEL",
+        "data": {
+            "id": "1000",
+            "name": "replay",
+            "type": channel_type,
+            "voice_states": [json.loads(voice_state_frame(user_id))["data"] for user_id in user_ids],
+        },
+        "evt": None,
+        "nonce": "1000",
+    })
+    frames = [channel] + sample_frames(users)
+    return [(index / 1000, frame) for index, frame in enumerate(frames)]
+
+
+def process_events_until(app: QApplication, deadline: float) -> None:
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def replay(app: QApplication, controller, speaking_coalescer, frames: list, realtime: bool) -> tuple:
+    """ Return the replay duration and the GUI thread CPU time over the same window, in seconds
+    """
+    connector = controller.discord_connector
+    cpu_started_at = time.thread_time()
+    started_at = time.perf_counter()
+    for at, frame in frames:
+        if realtime:
+            process_events_until(app, started_at + at)
+        connector.on_message(frame)
+        if not realtime:
+            speaking_coalescer.flush()
+        app.processEvents()
+    # The last frames are still waiting for the coalescer timer
+    speaking_coalescer.flush()
+    app.processEvents()
+    duration = time.perf_counter() - started_at
+    cpu_time = time.thread_time() - cpu_started_at
+    process_events_until(app, time.perf_counter() + DRAIN_SECONDS)
+    return duration, cpu_time
+
+
+def main() -> None:
+    from discord_overlay.config import DEFAULT_ROSTER_VIEW, ROSTER_VIEW_PAINTED, ROSTER_VIEW_WIDGETS
+    from discord_overlay.libs.frame_recorder import load_recording
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", nargs="?", help="JSONL file written by --record-frames")
+    parser.add_argument("--realtime", action="store_true", help="keep the recorded delays between frames")
+    parser.add_argument("--view", choices=(ROSTER_VIEW_WIDGETS, ROSTER_VIEW_PAINTED), default=DEFAULT_ROSTER_VIEW)
+    args = parser.parse_args()
+
+    app = QApplication([])
+    logging.basicConfig(level=logging.WARNING)
+    controller, main_widget = make_overlay(args.view)
+    app.processEvents()
+    frames = load_recording(args.recording) if args.recording \
+        else synthetic_recording(controller.discord_connector.voice_channel_type)
+
+    # The ScrollAreaUserContainer owns the speaking helpers of the widgets view
+    roster = main_widget._ui.scroll_area
+    speaking_coalescer = getattr(roster, "user_container", roster).speaking_coalescer
+    duration, gui_seconds = replay(app, controller, speaking_coalescer, frames, args.realtime)
+    print(f"{'frames':<12} {len(frames):>12,}")
+    print(f"{'users':<12} {len(controller.model.users):>12,}")
+    print(f"{'events/s':<12} {len(frames) / duration:>12,.0f}")
+    print(f"{'speaking':<12} {speaking_coalescer.applied:>12,} applied, {speaking_coalescer.dropped:,} dropped")
+    print(f"{'GUI time':<12} {gui_seconds / len(frames) * 1000:>10.3f}ms per event")
+    peak_rss = peak_rss_mb()
+    print(f"{'peak RSS':<12} {peak_rss:>10.1f}MB" if peak_rss is not None else f"{'peak RSS':<12} {'n/a':>12}")
+    print(f"speaking latency: {controller.latency_histogram.summary().splitlines()[0]}")
+
+
+if __name__ == "__main__":
+    main()
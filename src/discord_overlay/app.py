@@ -1,30 +1,50 @@
+import logging
+
+from PyQt6.QtCore import QEvent, QObject
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import QApplication
 
 from .config import Config
 from .controller import Controller
 from .libs import show_toast
+from .libs.startup_profile import startup_profile
 from .model import Model
 from .widgets.main import MainWidget
 from .widgets.systemtray import SystemTrayWidget
 
 
 class App(QApplication):
-    def __init__(self, organization_domain: str, name: str) -> None:
+    def __init__(self, organization_domain: str, name: str, record_frames: str = None) -> None:
         super().__init__([])
         self.setOrganizationDomain(organization_domain)
         self.setApplicationName(name)
         self.setQuitOnLastWindowClosed(False)
         self.setWindowIcon(QIcon("images:icon.png"))
+        startup_profile.mark("QApplication")
         self.config = Config(organization_domain, name)
+        self.aboutToQuit.connect(self.config.flush)
+        startup_profile.mark("config defaults")
         self.model = Model()
         self.controller = Controller(model=self.model, config=self.config)
+        if record_frames:
+            self.controller.record_frames(record_frames)
         self.controller.main_widget_visibility_hidden.connect(self.show_background_message)
         self.system_tray = SystemTrayWidget(
             controller=self.controller,
         )
         self.main_widget = MainWidget(controller=self.controller)
         self.main_widget.show()
+        startup_profile.mark("main window")
+        if startup_profile.enabled:
+            self.main_widget.installEventFilter(self)
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        # Only installed on the main widget for --profile-startup
+        if watched is self.main_widget and event.type() == QEvent.Type.Paint:
+            self.main_widget.removeEventFilter(self)
+            startup_profile.mark("first paint")
+            logging.info("Startup profile: %s", startup_profile.summary())
+        return super().eventFilter(watched, event)
 
     def show_background_message(self) -> None:
         if self.model.running_in_background_message_shown:
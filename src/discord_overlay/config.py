@@ -1,5 +1,9 @@
+import logging
+import os
+import stat
+from pathlib import Path
 from typing import Any
-from PyQt6.QtCore import QSettings
+from PyQt6.QtCore import QSettings, QTimer
 
 # App default settings
 STATIC_DIR_NAME = "static"
@@ -10,7 +14,47 @@ DEFAULT_DISCORD_CLIENT_ID = '207646673902501888'
 DEFAULT_DISCORD_ADDRESS = '127.0.0.1'
 DEFAULT_DISCORD_PORT = '6463'
 DEFAULT_STREAMKIT_ADDRESS = 'https://streamkit.discord.com'
+DEFAULT_STREAMKIT_TOKEN_URL = f'{DEFAULT_STREAMKIT_ADDRESS}/overlay/token'
 DEFAULT_VOICE_CHANNEL_TYPE = 2
+# Registered in memory on startup, stored values of the other keys are dropped
+DEFAULT_SETTINGS = {
+    "discord_client_address": DEFAULT_DISCORD_ADDRESS,
+    "discord_client_id": DEFAULT_DISCORD_CLIENT_ID,
+    "discord_client_port": DEFAULT_DISCORD_PORT,
+    "streamkit_address": DEFAULT_STREAMKIT_ADDRESS,
+    "streamkit_token_url": DEFAULT_STREAMKIT_TOKEN_URL,
+    "voice_channel_type": DEFAULT_VOICE_CHANNEL_TYPE,
+}
+# Can point to a local server, keep any value already set
+USER_OVERRIDABLE_DEFAULTS = {"streamkit_token_url"}
+# Writes are batched and flushed to the disk once no change happened for this delay
+CONFIG_WRITE_DELAY_MS = 500
+AVATAR_CACHE_DIR_NAME = "avatars"
+DEFAULT_AVATAR_CACHE_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_AVATAR_FETCH_WORKERS = 4
+# Show only speakers mode
+DEFAULT_SPEAKER_HOLD_MS = 500
+DEFAULT_SPEAKER_MIN_VISIBLE_MS = 1000
+# Roster renderers, picked on startup
+ROSTER_VIEW_WIDGETS = "widgets"
+ROSTER_VIEW_PAINTED = "painted"
+DEFAULT_ROSTER_VIEW = ROSTER_VIEW_WIDGETS
+# Settings read on hot paths, copied in Config.snapshot: key -> (type, default)
+SNAPSHOT_SETTINGS = {
+    "show_only_speakers": (bool, False),
+    "show_only_speakers_hold_ms": (int, DEFAULT_SPEAKER_HOLD_MS),
+    "show_only_speakers_min_visible_ms": (int, DEFAULT_SPEAKER_MIN_VISIBLE_MS),
+    "speaker_border_color": (str, "green"),
+    "user_avatar_size": (int, 28),
+    "user_nickname_color": (str, "white"),
+    "user_nickname_fontsize": (int, 12),
+}
+
+
+class ConfigSnapshot:
+    """ Typed in-memory copy of SNAPSHOT_SETTINGS, read as plain attributes
+    """
+    __slots__ = tuple(SNAPSHOT_SETTINGS)
 
 
 class Config(QSettings):
@@ -21,24 +65,68 @@ class Config(QSettings):
             organization_domain,
             application_name,
         )
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(CONFIG_WRITE_DELAY_MS)
+        self.flush_timer.timeout.connect(self.flush)
         self.set_default()
+        self.snapshot = ConfigSnapshot()
+        self.refresh_snapshot()
 
     def get(self, key: str, type: Any, default: Any = None) -> Any:
+        if default is None:
+            default = DEFAULT_SETTINGS.get(key)
         return self.value(key, defaultValue=default, type=type)
 
     def set(self, key: str, value: Any, override: bool = True) -> None:
-        setting = self.get(
-            key,
-            type=type(value)
-        )
-        if not setting or override:
-            self.setValue(key, value)
+        """ Set a value in memory, it is written to the disk by the next flush()
+        """
+        if self.contains(key):
+            setting = self.get(key, type=type(value))
+            if setting == value or (setting and not override):
+                return
+
+        self.setValue(key, value)
+        # Restarted on every change, a dragged spinbox is written once released
+        self.flush_timer.start()
+
+    def flush(self) -> None:
+        """ Write the pending changes to the disk
+        """
+        self.flush_timer.stop()
         self.sync()
 
+    def set_secret(self, key: str, value: Any) -> None:
+        """ Set a value that should only be readable by the current user
+        """
+        self.set(key, value)
+        # Write it right away so the permissions are fixed at once
+        self.flush()
+        try:
+            os.chmod(self.fileName(), stat.S_IRUSR | stat.S_IWUSR)
+        except OSError as error:
+            logging.warning("Unable to restrict access to %s: %s", self.fileName(), error)
+
     def set_default(self) -> None:
-        self.set('discord_client_address', DEFAULT_DISCORD_ADDRESS)
-        self.set('discord_client_id', DEFAULT_DISCORD_CLIENT_ID)
-        self.set('discord_client_port', DEFAULT_DISCORD_PORT)
-        self.set('streamkit_address', DEFAULT_STREAMKIT_ADDRESS)
-        self.set('voice_channel_type', DEFAULT_VOICE_CHANNEL_TYPE)
-        self.sync()
+        """ Defaults live in DEFAULT_SETTINGS and are never written to the disk
+
+        Older versions wrote them on every start, their copies are dropped once
+        so a new default is picked up.
+        """
+        for key in DEFAULT_SETTINGS.keys() - USER_OVERRIDABLE_DEFAULTS:
+            if self.contains(key):
+                self.remove(key)
+                self.flush_timer.start()
+
+    def refresh_snapshot(self, key: str = None) -> None:
+        """ Reload the snapshot, or only the given key, from the settings
+        """
+        keys = [key] if key else SNAPSHOT_SETTINGS
+        for name in keys:
+            if name in SNAPSHOT_SETTINGS:
+                value_type, default = SNAPSHOT_SETTINGS[name]
+                setattr(self.snapshot, name, self.get(name, type=value_type, default=default))
+
+    def get_avatar_cache_dir(self) -> Path:
+        # Next to the settings file: <config dir>/<organization>/<application>/avatars
+        return Path(self.fileName()).with_suffix("") / AVATAR_CACHE_DIR_NAME
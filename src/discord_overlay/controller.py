@@ -1,19 +1,26 @@
 import logging
-import sys
-import traceback
+import time
 from typing import TYPE_CHECKING
 
-from PyQt6.QtCore import QObject, Qt, pyqtSignal, pyqtSlot
+from PyQt6.QtCore import QMetaObject, QObject, Qt, QThread, QTimer, pyqtSignal, pyqtSlot
 from PyQt6.QtGui import QPixmap
-from PyQt6.QtWidgets import QApplication, QErrorMessage
+from PyQt6.QtWidgets import QApplication
 
 if TYPE_CHECKING:
-    from .widgets.user import UserWidget
+    from .widgets.main.central.roster_row import RosterRow
 
-from .config import Config
+from .config import DEFAULT_AVATAR_CACHE_MAX_BYTES, DEFAULT_AVATAR_FETCH_WORKERS, Config
 from .libs import show_toast
+from .libs.avatar_cache import AvatarCache
+from .libs.avatar_fetcher import AvatarFetcher
+from .libs.frame_recorder import FrameRecorder
+from .libs.latency import LatencyHistogram
+from .libs.paint_counter import PaintCounter
+from .libs.pixmap_cache import SHAPE_SQUARE, PixmapCache
+from .libs.reconnect import ReconnectBackoff
+from .libs.startup_profile import startup_profile
 from .libs.QDiscordWebSocket import QDiscordWebSocket
-from .model import Model
+from .model import Model, VoiceUser
 
 
 class Controller(QObject):
@@ -28,24 +35,79 @@ class Controller(QObject):
         super().__init__()
         self.model = model
         self.config = config
-        self.just_joined_channel = False
+        # Connected first so every other slot sees the refreshed snapshot
+        self.settings_changed_signal.connect(self.config.refresh_snapshot)
+        self.avatar_cache = AvatarCache(
+            directory=self.config.get_avatar_cache_dir(),
+            max_bytes=self.config.get(
+                "avatar_cache_max_bytes", type=int, default=DEFAULT_AVATAR_CACHE_MAX_BYTES
+            ),
+        )
+        self.avatar_fetcher = AvatarFetcher(
+            cache=self.avatar_cache,
+            max_workers=self.config.get(
+                "avatar_fetch_workers", type=int, default=DEFAULT_AVATAR_FETCH_WORKERS
+            ),
+            parent=self,
+        )
+        self.pixmap_cache = PixmapCache()
+        self.reconnect_backoff = ReconnectBackoff()
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.reconnect)
+        # Set while reconnecting, until the voice channel roster is resynced
+        self.resyncing = False
+        # Frame arrival to widget update
+        self.latency_histogram = LatencyHistogram()
+        # Avatar paint events, by user id
+        self.paint_counter = PaintCounter()
+        # Set by record_frames()
+        self.frame_recorder = None
+        self.discord_thread = None
         self.init_discord_connector()
 
     @pyqtSlot()
     def quit_app(self) -> None:
         self.discord_connector.should_stop = True
+        self.reconnect_timer.stop()
+        self.avatar_fetcher.stop()
+        if self.frame_recorder:
+            # Frames may still be recorded in the Discord thread while it stops
+            self.discord_connector.textMessageReceived.disconnect(self.frame_recorder.record)
+        stopped = True
+        if self.discord_thread:
+            # Closed before the thread stops running its event loop
+            self.invoke_connector("close_", blocking=True)
+            self.discord_thread.quit()
+            stopped = self.discord_thread.wait(1000)
+        if self.frame_recorder and stopped:
+            self.frame_recorder.close()
+        logging.info("Avatar cache stats: %s", self.avatar_cache.stats())
+        logging.info("Speaking event latency:\n%s", self.latency_histogram.summary())
+        logging.info("Avatar paint rate: %s", self.paint_counter.summary())
         QApplication.instance().quit()
 
     def init_discord_connector(self) -> None:
         logging.info("Connecting to Discord...")
-        self.discord_connector = QDiscordWebSocket(controller=self, parent=self)
-        self.discord_connector.errorOccurred.connect(self.on_connection_error)
+        if self.config.get("websocket_in_thread", type=bool, default=False):
+            # Socket I/O, JSON decoding and the protocol state machine run in
+            # their own thread, the GUI thread only gets the resulting deltas
+            self.discord_connector = QDiscordWebSocket(controller=self)
+            self.discord_thread = QThread(self)
+            self.discord_thread.setObjectName("QDiscordWebSocket")
+            self.discord_connector.moveToThread(self.discord_thread)
+            self.discord_thread.start()
+        else:
+            self.discord_connector = QDiscordWebSocket(controller=self, parent=self)
+        self.discord_connector.custom_signal_socket_error.connect(self.on_connection_error)
+        self.discord_connector.disconnected.connect(self.on_disconnected)
         self.discord_connector.custom_signal_connection_ok.connect(self.on_connection_ok)
         self.discord_connector.custom_signal_connection_failure.connect(self.on_connection_failure)
-        self.discord_connector.open_()
-        # self.discord_connector.custom_signal_you_joined_voice_channel.connect(
-        #     self.on_you_joined_voice_channel_signal
-        # )
+        self.discord_connector.custom_signal_token_received.connect(self.store_access_token)
+        self.discord_connector.custom_signal_token_rejected.connect(self.clear_access_token)
+        startup_profile.mark("controller")
+        self.invoke_connector("open_")
+        startup_profile.mark("websocket open")
         self.discord_connector.custom_signal_you_left_voice_channel.connect(
             self.on_you_left_voice_channel
         )
@@ -55,25 +117,99 @@ class Controller(QObject):
         self.discord_connector.custom_signal_someone_left_voice_channel.connect(
             self.on_someone_left_channel
         )
+        self.discord_connector.custom_signal_voice_channel_roster.connect(
+            self.on_voice_channel_roster
+        )
 
     def on_connection_failure(self) -> None:
         self.connection_status_changed.emit("FAILURE")
+        # Start over with a new session
+        self.invoke_connector("close_")
 
     def on_connection_ok(self) -> None:
+        self.reconnect_backoff.reset()
         self.connection_status_changed.emit("OK")
 
     def on_connection_error(self, error: str) -> None:
-        self.connection_status_changed.emit("ERROR")
-        logging.error("Unable to connect to discord - is discord running?")
-        logging.error(f"{error}:\n{traceback.print_exc()}")
-        error_dialog = QErrorMessage()
-        error_dialog.setWindowTitle("Unable to connect to discord")
-        error_dialog.showMessage(f"{error}. Is discord running?")
-        error_dialog.exec()
-        sys.exit(1)
-
-    # def on_you_joined_voice_channel_signal(self) -> None:
-    #     logging.debug("You joined a channel")
+        if not self.reconnect_timer.isActive():
+            self.connection_status_changed.emit("ERROR")
+        logging.error("Unable to connect to discord - is discord running? %s", error)
+        self.schedule_reconnect()
+
+    def on_disconnected(self) -> None:
+        logging.info("Disconnected from discord")
+        self.schedule_reconnect()
+
+    def schedule_reconnect(self) -> None:
+        if self.discord_connector.should_stop or self.reconnect_timer.isActive():
+            return
+
+        delay = self.reconnect_backoff.next_delay()
+        logging.info(
+            "Reconnecting to discord in %sms (attempt %s)", delay, self.reconnect_backoff.attempt
+        )
+        self.connection_status_changed.emit("RECONNECTING")
+        self.reconnect_timer.start(delay)
+
+    def reconnect(self) -> None:
+        logging.info("Connecting to Discord...")
+        self.resyncing = True
+        self.invoke_connector("reopen")
+
+    def record_frames(self, path: str) -> None:
+        """ Record every frame received from Discord, see benchmarks/replay.py
+        """
+        self.frame_recorder = FrameRecorder(path)
+        # Recorded in the thread receiving the frames
+        self.discord_connector.textMessageReceived.connect(
+            self.frame_recorder.record, Qt.ConnectionType.DirectConnection
+        )
+
+    def invoke_connector(self, method: str, blocking: bool = False) -> None:
+        """ Call a discord_connector slot in the thread it lives in
+
+        With blocking, wait for the slot to return.
+        """
+        if self.discord_thread:
+            connection_type = Qt.ConnectionType.BlockingQueuedConnection if blocking \
+                else Qt.ConnectionType.QueuedConnection
+            QMetaObject.invokeMethod(self.discord_connector, method, connection_type)
+        else:
+            getattr(self.discord_connector, method)()
+
+    def load_access_token(self) -> str | None:
+        access_token = self.config.get("access_token", type=str)
+        expires_at = self.config.get("access_token_expires_at", type=int, default=0)
+        if not access_token:
+            return None
+
+        if expires_at and expires_at <= time.time():
+            logging.info("Stored access token expired")
+            self.clear_access_token()
+            return None
+
+        logging.debug("Using stored access token")
+        return access_token
+
+    def store_access_token(self, access_token: str, expires_in: int) -> None:
+        expires_at = int(time.time()) + expires_in if expires_in else 0
+        self.config.set_secret("access_token", access_token)
+        self.config.set("access_token_expires_at", expires_at)
+
+    def clear_access_token(self) -> None:
+        self.config.set("access_token", "")
+        self.config.set("access_token_expires_at", 0)
+
+    def on_voice_channel_roster(self, users: list) -> None:
+        if self.resyncing:
+            # Only announce the users who came and left while disconnected
+            self.resyncing = False
+            logging.debug("Resyncing %s users after reconnection", len(users))
+            self.model.sync_users(users)
+            return
+
+        logging.debug("Loading the %s users of the channel", len(users))
+        self.model.reset_users(users)
 
     def on_you_left_voice_channel(self) -> None:
         logging.debug(
@@ -81,66 +217,60 @@ class Controller(QObject):
         )
         self.model.empty_users()
 
-    def on_update_voice_channel(self, data: dict) -> None:
-        logging.debug(f"Got an update channel event:\n {data}")
-        user: dict = data["data"]["user"]
-        user["nick"] = data["data"]["nick"]
-        user["voice_state"] = data["data"]["voice_state"]
-
-        if not user.get("id") in self.model.users:
+    def on_update_voice_channel(self, user: VoiceUser) -> None:
+        logging.debug("Got an update channel event:\n %s", user)
+        if user.id not in self.model.users:
             self.model.add_user(user)
         else:
             self.model.change_user(user)
 
-    def on_someone_left_channel(self, data: dict) -> None:
-        logging.debug(f"{data['data']['nick']} left the channel")
-        user: dict = data["data"]["user"]
-        self.model.delete_user(user.get("id"))
+    def on_someone_left_channel(self, user_id: str) -> None:
+        self.model.delete_user(user_id)
 
     def someone_left_channel_notification(
-        self, user_widget: "UserWidget", send_toast=True
+        self, user_widget: "RosterRow", send_toast=True
     ) -> None:
-        icon = self.get_icon(user_widget.avatar_data, user_widget.get_avatar_size())
-        logging.debug(f"{user_widget.user_data['nick']} left the channel")
+        logging.debug(f"{user_widget.user.nick} left the channel")
 
-        if user_widget.user_data.get("id") == self.discord_connector.user.get("id"):
+        if user_widget.user.id == self.discord_connector.user.get("id"):
             return
 
         if send_toast:
+            icon = self.get_icon(
+                user_widget.avatar_key, user_widget.avatar_data, user_widget.get_avatar_size()
+            )
             show_toast(
                 parent=None,
                 title="Someone left the channel",
-                text=f"{user_widget.user_data['nick']} left the channel",
+                text=f"{user_widget.user.nick} left the channel",
                 # preset="error",
                 icon=icon,
+                name=user_widget.user.nick,
+                aggregate="{count} people left the channel: {names}",
             )
 
-    def someone_joined_channel_notification(self, user_widget: "UserWidget") -> None:
-        logging.debug(f"{user_widget.user_data['nick']} joined the channel")
-        if self.just_joined_channel:
-            self.just_joined_channel = False
-            return
-
-        if user_widget.user_data.get("id") == self.discord_connector.user.get("id"):
+    def someone_joined_channel_notification(self, user_widget: "RosterRow") -> None:
+        logging.debug(f"{user_widget.user.nick} joined the channel")
+        if user_widget.user.id == self.discord_connector.user.get("id"):
             return
 
-        icon = self.get_icon(user_widget.avatar_data, user_widget.get_avatar_size())
+        icon = self.get_icon(
+            user_widget.avatar_key, user_widget.avatar_data, user_widget.get_avatar_size()
+        )
 
         show_toast(
             parent=None,
             title="Discord-Overlay",
-            text=f"{user_widget.user_data['nick']} joined the channel",
+            text=f"{user_widget.user.nick} joined the channel",
             # preset="success",
             icon=icon,
+            name=user_widget.user.nick,
+            aggregate="{count} people joined the channel: {names}",
         )
 
-    def get_icon(self, bytes, size):
-        icon_pix = QPixmap()
-        icon_pix.loadFromData(bytes)
-        icon_pix = icon_pix.scaled(
-            size,
-            size,
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation,
-        )
-        return icon_pix
+    def get_icon(self, avatar_key: str, avatar_data: bytes | None, size: int) -> QPixmap | None:
+        if not avatar_data:
+            # Not downloaded, a null pixmap would stay in the cache under the avatar key
+            return None
+
+        return self.pixmap_cache.get(avatar_key, avatar_data, size, SHAPE_SQUARE)
@@ -1,31 +1,50 @@
 import json
 import logging
-import sys
+import time
 import uuid
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 
-import requests
-from PyQt6.QtCore import QUrl, pyqtSignal
+from PyQt6.QtCore import QUrl, pyqtSignal, pyqtSlot
+from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkReply, QNetworkRequest
 from PyQt6.QtWebSockets import QWebSocket
 
+from ..model import VoiceUser
+from . import rpc_json
+
 if TYPE_CHECKING:
     from ..controller import Controller
 
 
+# Commands whose handler deals with their ERROR replies, the other ones are
+# only logged by handle_error()
+ERROR_HANDLING_COMMANDS = ("AUTHENTICATE", "AUTHORIZE")
+
+
 class QDiscordWebSocket(QWebSocket):
-    custom_signal_you_joined_voice_channel = pyqtSignal()
     custom_signal_you_left_voice_channel = pyqtSignal()
-    custom_signal_someone_left_voice_channel = pyqtSignal(dict)
+    # The signals below only carry processed deltas, so the websocket can run
+    # in its own thread and only post what the GUI needs
+    # user_id
+    custom_signal_someone_left_voice_channel = pyqtSignal(str)
     custom_signal_someone_joined_voice_channel = pyqtSignal(dict)
-    custom_signal_update_voice_channel = pyqtSignal(dict)
-    custom_signal_speaking_start = pyqtSignal(dict)
-    custom_signal_speaking_stop = pyqtSignal(dict)
+    # VoiceUser
+    custom_signal_update_voice_channel = pyqtSignal(object)
+    # VoiceUser list of the voice channel we are in, empty when not in a channel
+    custom_signal_voice_channel_roster = pyqtSignal(list)
+    # user_id, time.perf_counter() when the frame was received
+    custom_signal_speaking_start = pyqtSignal(str, float)
+    custom_signal_speaking_stop = pyqtSignal(str, float)
 
     custom_signal_authenticated = pyqtSignal()
+    # access token, expires_in in seconds (0 if unknown)
+    custom_signal_token_received = pyqtSignal(str, int)
+    custom_signal_token_error = pyqtSignal(str)
+    custom_signal_token_rejected = pyqtSignal()
 
-    custom_signal_connection_error = pyqtSignal(str)
     custom_signal_connection_failure = pyqtSignal()
     custom_signal_connection_ok = pyqtSignal()
+    # errorString(), read in the thread of the socket
+    custom_signal_socket_error = pyqtSignal(str)
 
     def __init__(self, controller: "Controller", parent=None) -> None:
         self.controller = controller
@@ -34,9 +53,10 @@ class QDiscordWebSocket(QWebSocket):
         self.address = self.controller.config.get("discord_client_address", type=str)
         self.port = self.controller.config.get("discord_client_port", type=str)
         self.voice_channel_type = self.controller.config.get("voice_channel_type", type=int)
+        self.token_url = self.controller.config.get("streamkit_token_url", type=str)
         self.uri = f"ws://{self.address}:{self.port}/?v=1&client_id={self.client_id}"
 
-        self.access_token = None
+        self.access_token = self.controller.load_access_token()
         self.user = None
         self.in_room = []
         self.current_voice_channel_id = None
@@ -45,66 +65,97 @@ class QDiscordWebSocket(QWebSocket):
         self.userlist = {}
         self.last_connection = None
         self.authenticated = False
+        self.should_stop = False
+        self.frame_received_at = 0.0
 
         super().__init__(origin=self._origin, parent=parent)
 
+        self.network_manager = QNetworkAccessManager(self)
         self.textMessageReceived.connect(self.on_message)
-        self.supported_commands = [
-            "DISPATCH",
-            "AUTHENTICATE",
-            "AUTHORIZE",
-            "GET_GUILDS",
-            "GET_CHANNELS",
-            "GET_CHANNEL",
-            "SUBSCRIBE",
-            "UNSUBSCRIBE",
-            "GET_SELECTED_VOICE_CHANNEL",
-        ]
-        self.supported_events = [
-            "READY",
-            "VOICE_STATE_UPDATE",
-            "VOICE_CONNECTION_STATUS",
-            "VOICE_CHANNEL_SELECT",
-            "SPEAKING_START",
-            "SPEAKING_STOP",
-            "VOICE_STATE_CREATE",
-            "VOICE_STATE_DELETE",
-        ]
+        self.errorOccurred.connect(self.on_socket_error)
+        self.custom_signal_token_received.connect(self.on_token_received)
+        self.custom_signal_token_error.connect(self.on_token_error)
+        # cmd -> handler, None for supported commands we have nothing to do with
+        self.command_handlers = {
+            "DISPATCH": self.handle_dispatch_command,
+            "AUTHENTICATE": self.handle_authenticate_command,
+            "AUTHORIZE": self.handle_authorize_command,
+            "GET_GUILDS": None,
+            "GET_CHANNELS": None,
+            "GET_CHANNEL": self.handle_get_channel,
+            "SUBSCRIBE": None,
+            "UNSUBSCRIBE": None,
+            "GET_SELECTED_VOICE_CHANNEL": self.handle_get_selected_voice_channel,
+        }
+        # DISPATCH evt -> handler
+        self.event_handlers = {
+            "READY": self.handle_ready_event,
+            "VOICE_STATE_UPDATE": self.handle_voice_state_update_event,
+            "VOICE_CONNECTION_STATUS": self.handle_voice_connection_status_event,
+            "VOICE_CHANNEL_SELECT": self.handle_voice_channel_select_event,
+            "SPEAKING_START": self.handle_speaking_start_event,
+            "SPEAKING_STOP": self.handle_speaking_stop_event,
+            "VOICE_STATE_CREATE": self.handle_voice_state_create_event,
+            "VOICE_STATE_DELETE": self.handle_voice_state_delete_event,
+        }
+
+    def register_command_handler(self, command: str, handler: Callable[[dict], None] | None) -> None:
+        self.command_handlers[command] = handler
+
+    def register_event_handler(self, event: str, handler: Callable[[dict], None]) -> None:
+        self.event_handlers[event] = handler
 
+    @pyqtSlot()
     def open_(self) -> None:
         self.open(QUrl(self.uri))
 
-    def on_message(self, message: str) -> None:
-        data: dict = json.loads(message)
-        command = data.get("cmd")
+    @pyqtSlot()
+    def close_(self) -> None:
+        self.close()
 
-        if data.get("evt") == "ERROR":
-            self.handle_error(data)
+    @pyqtSlot()
+    def reopen(self) -> None:
+        self.reset_session()
+        self.open_()
 
-        if command not in self.supported_commands:
-            logging.warning(f"Unsupported command: {command}")
-            return
+    def on_socket_error(self, error) -> None:
+        self.custom_signal_socket_error.emit(self.errorString())
 
-        if command == "DISPATCH":
-            self.handle_dispatch_command(data)
-            return
+    def reset_session(self) -> None:
+        """ Forget the state bound to the previous connection before reopening
+        """
+        self.authenticated = False
+        self.last_connection = None
+        # Subscriptions died with the connection
+        self.current_voice_channel_id = None
 
-        if command == "AUTHENTICATE":
-            self.handle_authenticate_command(data)
+    @pyqtSlot(str)
+    def on_message(self, message: str) -> None:
+        self.frame_received_at = time.perf_counter()
+        speaking = rpc_json.classify_speaking_frame(message) if rpc_json.CLASSIFY_SPEAKING_FRAMES else None
+        if speaking:
+            # Hot path: only evt and user_id are needed
+            event, user_id = speaking
+            self.event_handlers[event]({"evt": event, "data": {"user_id": user_id}})
             return
 
-        if command == "AUTHORIZE":
-            self.handle_authorize_command(data)
-            return
+        data: dict = rpc_json.loads(message)
+        command = data.get("cmd")
 
-        if command == "GET_CHANNEL":
-            self.handle_get_channel(data)
-            return
+        if data.get("evt") == "ERROR":
+            self.handle_error(data)
+            if command not in ERROR_HANDLING_COMMANDS:
+                return
 
-        if command == "GET_SELECTED_VOICE_CHANNEL":
-            self.handle_get_selected_voice_channel(data)
+        try:
+            handler = self.command_handlers[command]
+        except KeyError:
+            logging.warning("Unsupported command: %s", command)
             return
 
+        if handler:
+            handler(data)
+
     def handle_error(self, data: dict) -> None:
         code = data.get("data", {}).get("code")
         if code == 4009:
@@ -113,7 +164,6 @@ class QDiscordWebSocket(QWebSocket):
         message = data.get("data", {}).get("message", "Unknown error")
         logging.error(f"An error happened: ({code}) {message}")
         logging.error(f"data:\n{json.dumps(data, indent=4)}")
-        sys.exit(1)
 
     def handle_get_channel(self, data: dict) -> None:
         if data["data"]["type"] == self.voice_channel_type:
@@ -121,87 +171,98 @@ class QDiscordWebSocket(QWebSocket):
             if self.current_voice_channel_id:
                 self.set_active_channel(None)
 
-            self.controller.just_joined_channel = True
             self.set_active_channel(data["data"]["id"], name=data["data"]["name"])
+            # Everyone already there, the VOICE_STATE_* events only bring changes
+            self.custom_signal_voice_channel_roster.emit(
+                [VoiceUser.from_voice_state(voice_state) for voice_state in data["data"].get("voice_states", [])]
+            )
         else:
             logging.error(f"Unsupported channel type: {data['data']['type']}")
 
     def handle_get_selected_voice_channel(self, data: dict) -> None:
         if not data["data"]:
             logging.info("We are not connected to any voice channel yet")
+            self.custom_signal_voice_channel_roster.emit([])
             return
         else:
             if data["data"].get("name"):
-                logging.info(f"Already in a channel: {data['data'].get("name")}")
+                logging.info(f"Already in a channel: {data['data'].get('name')}")
                 self.set_active_channel(data["data"]["id"], name=data["data"]["name"])
+            self.custom_signal_voice_channel_roster.emit(
+                [VoiceUser.from_voice_state(voice_state) for voice_state in data["data"].get("voice_states", [])]
+            )
 
     def handle_dispatch_command(self, data: dict) -> None:
         event = data["evt"]
-        if event not in self.supported_events:
-            logging.warning(f"Unsupported event:{event}")
+        try:
+            handler = self.event_handlers[event]
+        except KeyError:
+            logging.warning("Unsupported event: %s", event)
             return
 
-        if event == "READY":
-            # We got server info, lets authenticate
-            self.request_authentication_token()
-            return
+        handler(data)
 
-        if event == "VOICE_STATE_DELETE":
-            # You or A user leaves a subscribed voice channel
-            logging.debug(
-                f"Someone left a channel: {data['data']['user']['id']}"
-                f"({data['data']['user']['username']})"
-            )
-            self.custom_signal_someone_left_voice_channel.emit(data)
-            if data["data"]["user"]["id"] == self.user["id"]:
-                self.set_active_channel(None)
-            return
+    def handle_ready_event(self, data: dict) -> None:
+        # We got server info, lets authenticate
+        self.request_authentication_token()
 
-        if event == "VOICE_STATE_UPDATE":
-            # A user's voice state changes in a subscribed voice channel (mute, volume, etc.)
-            logging.debug(
-                f"Voice state update: {data['data']['user']['id']}"
-                f"({data['data']['user']['username']})"
-            )
-            self.custom_signal_update_voice_channel.emit(data)
-            return
-
-        if event == "VOICE_CHANNEL_SELECT":
-            # We join or leave a channel
-            # When we leave we need to unsubscribe from previous channel
-            channel_id = data.get("data", {}).get("channel_id")
+    def handle_voice_state_delete_event(self, data: dict) -> None:
+        # You or A user leaves a subscribed voice channel
+        logging.debug(
+            "Someone left a channel: %s(%s)",
+            data["data"]["user"]["id"],
+            data["data"]["user"]["username"],
+        )
+        logging.debug("%s left the channel", data["data"]["nick"])
+        self.custom_signal_someone_left_voice_channel.emit(data["data"]["user"]["id"])
+        if data["data"]["user"]["id"] == self.user["id"]:
+            self.set_active_channel(None)
+
+    def handle_voice_state_update_event(self, data: dict) -> None:
+        # A user's voice state changes in a subscribed voice channel (mute, volume, etc.)
+        logging.debug(
+            "Voice state update: %s(%s)",
+            data["data"]["user"]["id"],
+            data["data"]["user"]["username"],
+        )
+        self.custom_signal_update_voice_channel.emit(VoiceUser.from_voice_state(data["data"]))
 
-            if not channel_id:
-                # we leave the channel
-                self.set_active_channel(None)
-                return
+    def handle_voice_channel_select_event(self, data: dict) -> None:
+        # We join or leave a channel
+        # When we leave we need to unsubscribe from previous channel
+        channel_id = data.get("data", {}).get("channel_id")
 
-            # We join a channel, request channel details which handles
-            # setting the active channel in handle_get_channel
-            self.request_channel_details(channel_id)
+        if not channel_id:
+            # we leave the channel
+            self.set_active_channel(None)
             return
 
-        if event == "VOICE_STATE_CREATE":
-            # A user joins a subscribed voice channel
-            # self.custom_signal_someone_joined_voice_channel.emit(data)
-            return
+        # We join a channel, request channel details which handles
+        # setting the active channel in handle_get_channel
+        self.request_channel_details(channel_id)
 
-        if event == "VOICE_CONNECTION_STATUS":
-            # The client's voice connection status changes
-            self.last_connection = data["data"]["state"]
-            return
+    def handle_voice_state_create_event(self, data: dict) -> None:
+        # A user joins a subscribed voice channel
+        # self.custom_signal_someone_joined_voice_channel.emit(data)
+        pass
 
-        if event == "SPEAKING_START":
-            self.custom_signal_speaking_start.emit(data)
-            return
+    def handle_voice_connection_status_event(self, data: dict) -> None:
+        # The client's voice connection status changes
+        self.last_connection = data["data"]["state"]
 
-        if event == "SPEAKING_STOP":
-            self.custom_signal_speaking_stop.emit(data)
-            return
+    def handle_speaking_start_event(self, data: dict) -> None:
+        self.custom_signal_speaking_start.emit(data["data"]["user_id"], self.frame_received_at)
+
+    def handle_speaking_stop_event(self, data: dict) -> None:
+        self.custom_signal_speaking_stop.emit(data["data"]["user_id"], self.frame_received_at)
 
     def handle_authenticate_command(self, data: dict) -> None:
         event = data["evt"]
         if event == "ERROR":
+            if self.access_token:
+                logging.info("Stored access token rejected")
+                self.access_token = None
+                self.custom_signal_token_rejected.emit()
             logging.info("Authenticating...")
             self.get_access_token_stage1()
         else:
@@ -214,6 +275,11 @@ class QDiscordWebSocket(QWebSocket):
             self.request_find_user()
 
     def handle_authorize_command(self, data: dict) -> None:
+        if data.get("evt") == "ERROR":
+            # Denied or timed out, start over with a new session
+            self.custom_signal_token_error.emit(data["data"].get("message", "Authorization failed"))
+            return
+
         self.get_access_token_stage2(data["data"]["code"])
 
     def set_active_channel(self, channel_id, name=None) -> None:
@@ -235,7 +301,6 @@ class QDiscordWebSocket(QWebSocket):
         # Then subscribe to the new channel
         self.current_voice_channel_id = channel_id
         self.sub_voice_channel(channel_id)
-        # self.custom_signal_you_joined_voice_channel.emit()
 
     def sub_raw(self, event, args, nonce) -> None:
         if not nonce:
@@ -293,20 +358,40 @@ class QDiscordWebSocket(QWebSocket):
         self.sendTextMessage(json.dumps(cmd))
 
     def get_access_token_stage2(self, code1) -> None:
-        url = "https://streamkit.discord.com/overlay/token"
-        myobj = {"code": code1}
-        response = requests.post(url, json=myobj, timeout=30)
+        logging.debug("Requesting access token from %s", self.token_url)
+        request = QNetworkRequest(QUrl(self.token_url))
+        request.setHeader(QNetworkRequest.KnownHeaders.ContentTypeHeader, "application/json")
+        request.setTransferTimeout(30000)
+        reply = self.network_manager.post(request, json.dumps({"code": code1}).encode())
+        reply.finished.connect(lambda: self.on_token_reply(reply))
+
+    def on_token_reply(self, reply: QNetworkReply) -> None:
+        reply.deleteLater()
+        if reply.error() != QNetworkReply.NetworkError.NoError:
+            self.custom_signal_token_error.emit(reply.errorString())
+            return
 
         try:
-            jsonresponse = json.loads(response.text)
+            jsonresponse = json.loads(bytes(reply.readAll()))
         except json.JSONDecodeError:
             jsonresponse = {}
 
         if "access_token" in jsonresponse:
-            self.access_token = jsonresponse["access_token"]
-            self.request_authentication_token()
+            self.custom_signal_token_received.emit(
+                jsonresponse["access_token"], int(jsonresponse.get("expires_in") or 0)
+            )
         else:
-            sys.exit(1)
+            self.custom_signal_token_error.emit("No access token in the token endpoint response")
+
+    @pyqtSlot(str, int)
+    def on_token_received(self, access_token: str, expires_in: int) -> None:
+        self.access_token = access_token
+        self.request_authentication_token()
+
+    @pyqtSlot(str)
+    def on_token_error(self, error: str) -> None:
+        logging.error("Unable to get an access token: %s", error)
+        self.custom_signal_connection_failure.emit()
 
     def request_authentication_token(self) -> None:
         logging.debug("Emitting AUTHENTICATE")
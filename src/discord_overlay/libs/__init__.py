@@ -1,7 +1,116 @@
-from pyqttoast import Toast, ToastPreset
+from typing import TYPE_CHECKING
 
+from PyQt6.QtCore import QObject, QTimer
+
+if TYPE_CHECKING:
+    from pyqttoast import Toast
+
+# Toasts on screen at the same time, the others wait in the ToastQueue
+MAX_SHOWN_TOASTS = 3
+# Requests are held that long so the ones sharing an aggregate get merged
+TOAST_AGGREGATION_DELAY_MS = 500
+# Names listed in a merged toast, the others are only counted
+TOAST_AGGREGATED_NAMES = 3
+
+
+class ToastRequest:
+    """ A toast waiting in the ToastQueue, no widget is created before it is shown
+    """
+    __slots__ = ("parent", "title", "text", "duration", "preset", "icon", "aggregate", "names")
+
+    def __init__(self, parent, title, text, duration, preset, icon, name, aggregate) -> None:
+        self.parent = parent
+        self.title = title
+        self.text = text
+        self.duration = duration
+        self.preset = preset
+        self.icon = icon
+        self.aggregate = aggregate
+        self.names = [name]
+
+    def merged_text(self) -> str:
+        if len(self.names) == 1:
+            return self.text
+
+        names = ", ".join(self.names[:TOAST_AGGREGATED_NAMES])
+        if len(self.names) > TOAST_AGGREGATED_NAMES:
+            names += "…"
+        return self.aggregate.format(count=len(self.names), names=names)
+
+
+class ToastQueue(QObject):
+    """ Bound the number of toasts, and of their windows and timers, during bursts
+
+    Requests sharing an aggregate template are merged while they wait, e.g.
+    "5 people joined the channel: A, B, C…". At most max_shown toasts exist
+    at a time, the next one is created when one closes.
+    """
+
+    def __init__(
+        self, max_shown: int = MAX_SHOWN_TOASTS, delay_ms: int = TOAST_AGGREGATION_DELAY_MS, parent=None
+    ) -> None:
+        super().__init__(parent=parent)
+        self.max_shown = max_shown
+        self.shown = 0
+        # ToastRequest, oldest first
+        self.pending = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.show_pending)
+
+    def push(self, request: ToastRequest) -> None:
+        if request.aggregate:
+            for pending in self.pending:
+                if pending.aggregate == request.aggregate:
+                    pending.names.extend(request.names)
+                    return
+
+        self.pending.append(request)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def show_pending(self) -> None:
+        while self.pending and self.shown < self.max_shown:
+            request = self.pending.pop(0)
+            merged = len(request.names) > 1
+            toast = create_toast(
+                request.parent,
+                request.title,
+                request.merged_text(),
+                duration=request.duration,
+                preset=request.preset,
+                # One avatar for several people would be misleading
+                icon=None if merged else request.icon,
+            )
+            toast.closed.connect(self.on_toast_closed)
+            self.shown += 1
+            toast.show()
+
+    def on_toast_closed(self) -> None:
+        self.shown -= 1
+        if self.pending and not self.timer.isActive():
+            self.timer.start()
+
+    def clear(self) -> None:
+        self.timer.stop()
+        self.pending = []
+
+
+_toast_queue = None
+
+
+def get_toast_queue() -> ToastQueue:
+    global _toast_queue
+    if _toast_queue is None:
+        _toast_queue = ToastQueue()
+    return _toast_queue
+
+
+def create_toast(parent, title, text, duration=5000, preset=None, icon=None) -> "Toast":
+    # pyqttoast pulls qtpy in, it is only imported once a toast is shown
+    from pyqttoast import Toast, ToastPreset
 
-def show_toast(parent, title, text, duration=5000, preset=None, icon=None):
     toast = Toast(parent)
     toast.setDuration(duration)
     toast.setTitle(title)
@@ -22,4 +131,13 @@ def show_toast(parent, title, text, duration=5000, preset=None, icon=None):
         toast.setIcon(icon)
 
     toast.setShowDurationBar(True)
-    toast.show()
+    return toast
+
+
+def show_toast(parent, title, text, duration=5000, preset=None, icon=None, name=None, aggregate=None):
+    """ Queue a toast, see ToastQueue
+
+    Toasts with the same aggregate template waiting together are shown as one,
+    aggregate is formatted with the number of toasts and their names.
+    """
+    get_toast_queue().push(ToastRequest(parent, title, text, duration, preset, icon, name, aggregate))
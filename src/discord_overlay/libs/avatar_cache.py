@@ -0,0 +1,133 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from ..model import VoiceUser
+
+AVATAR_CACHE_FILE_SUFFIX = ".png"
+
+
+def avatar_cache_key(user: "VoiceUser") -> str:
+    """ Key of a user avatar in the cache
+
+    Discord avatar hashes are immutable, so (user_id, avatar_hash) always points
+    to the same image. Users without avatar share the discord default ones.
+    """
+    if not user.avatar:
+        return f"embed_{int(user.discriminator) % 5}"
+    return f"{user.id}_{user.avatar}"
+
+
+def avatar_url(user: "VoiceUser") -> str:
+    if not user.avatar:
+        # That is how discord do it
+        avatar_id = int(user.discriminator) % 5
+        return f"https://cdn.discordapp.com/embed/avatars/{avatar_id}.png"
+    return f"https://cdn.discordapp.com/avatars/{user.id}/{user.avatar}.png"
+
+
+class AvatarCache:
+    """ Persistent content-addressed avatar cache with LRU eviction
+
+    Entries are stored as one file per key; the file mtime is used as the LRU
+    clock so the order survives restarts.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._entries = OrderedDict()
+        self._size = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".tmp"):
+                    # Leftover of an interrupted write
+                    os.unlink(entry.path)
+                elif entry.is_file() and entry.name.endswith(AVATAR_CACHE_FILE_SUFFIX):
+                    files.append(entry)
+        except OSError as error:
+            logging.warning("Unable to use avatar cache directory %s: %s", self.directory, error)
+            return
+
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            size = entry.stat().st_size
+            self._entries[entry.name[:-len(AVATAR_CACHE_FILE_SUFFIX)]] = size
+            self._size += size
+
+        logging.debug("Avatar cache: %s entries, %s bytes", len(self._entries), self._size)
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{AVATAR_CACHE_FILE_SUFFIX}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            try:
+                data = self._path(key).read_bytes()
+                os.utime(self._path(key))
+            except OSError:
+                self._size -= self._entries.pop(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not data or len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            try:
+                # Write to a temporary file then rename it, so a crash never
+                # leaves a truncated avatar behind
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                with os.fdopen(fd, "wb") as tmp_file:
+                    tmp_file.write(data)
+                os.replace(tmp_path, self._path(key))
+            except OSError as error:
+                logging.warning("Unable to write avatar %s to cache: %s", key, error)
+                return
+
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+            logging.debug("Evicted avatar %s from cache", key)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,118 @@
+import logging
+from typing import Callable
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from ..config import DEFAULT_AVATAR_FETCH_WORKERS
+from .avatar_cache import AvatarCache
+
+AVATAR_FETCH_CONNECT_TIMEOUT = 5.0
+AVATAR_FETCH_READ_TIMEOUT = 10.0
+
+
+class AvatarFetchSignals(QObject):
+    # Emitted from the worker threads, delivered in the fetcher thread
+    finished = pyqtSignal(str, "QByteArray")
+    failed = pyqtSignal(str)
+
+
+class AvatarFetchJob(QRunnable):
+    def __init__(self, url: str, cache_key: str, fetcher: "AvatarFetcher") -> None:
+        super().__init__()
+        self.url = url
+        self.cache_key = cache_key
+        self.http = fetcher.http
+        self.cache = fetcher.cache
+        self.signals = fetcher.signals
+        # The fetcher keeps a reference until the job is done or cancelled
+        self.setAutoDelete(False)
+
+    def run(self) -> None:
+        import urllib3
+
+        timeout = urllib3.Timeout(connect=AVATAR_FETCH_CONNECT_TIMEOUT, read=AVATAR_FETCH_READ_TIMEOUT)
+        try:
+            response = self.http.request("GET", self.url, timeout=timeout)
+        except urllib3.exceptions.HTTPError as error:
+            logging.warning("Unable to download avatar %s: %s", self.url, error)
+            self.signals.failed.emit(self.url)
+            return
+
+        if response.status != 200:
+            logging.warning("Unable to download avatar %s: HTTP %s", self.url, response.status)
+            self.signals.failed.emit(self.url)
+            return
+
+        if self.cache:
+            self.cache.put(self.cache_key, response.data)
+        self.signals.finished.emit(self.url, response.data)
+
+
+class AvatarFetcher(QObject):
+    """ Download avatars on a fixed number of workers sharing one HTTP pool
+
+    Requests for an URL already being downloaded are merged, and every
+    callback is called in the fetcher (GUI) thread once the download is done,
+    with None if it failed.
+    """
+
+    def __init__(
+        self, cache: AvatarCache = None, max_workers: int = DEFAULT_AVATAR_FETCH_WORKERS, parent=None
+    ) -> None:
+        super().__init__(parent=parent)
+        self.cache = cache
+        self.threadpool = QThreadPool(self)
+        self.threadpool.setMaxThreadCount(max_workers)
+        self.max_workers = max_workers
+        # Created by the first fetch, urllib3 is not needed to show the overlay
+        self.http = None
+        self.signals = AvatarFetchSignals(self)
+        self.signals.finished.connect(self.on_finished)
+        self.signals.failed.connect(self.on_failed)
+        # url -> (job, [callbacks])
+        self._pending = {}
+
+    def fetch(self, url: str, cache_key: str, callback: Callable[[bytes | None], None]) -> None:
+        if url in self._pending:
+            logging.debug("Avatar %s already being downloaded", url)
+            self._pending[url][1].append(callback)
+            return
+
+        if self.http is None:
+            import urllib3
+
+            # Every avatar lives on the same CDN host, so a single keep-alive
+            # pool sized to the worker count is enough
+            self.http = urllib3.PoolManager(num_pools=2, maxsize=self.max_workers, block=True)
+
+        job = AvatarFetchJob(url=url, cache_key=cache_key, fetcher=self)
+        self._pending[url] = (job, [callback])
+        self.threadpool.start(job)
+
+    def cancel(self, url: str, callback: Callable[[bytes | None], None]) -> None:
+        if url not in self._pending:
+            return
+
+        job, callbacks = self._pending[url]
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+        if not callbacks and self.threadpool.tryTake(job):
+            # Not started yet, nobody is waiting for it anymore
+            logging.debug("Cancelled avatar download %s", url)
+            del self._pending[url]
+
+    def on_finished(self, url: str, data: bytes) -> None:
+        _, callbacks = self._pending.pop(url, (None, []))
+        for callback in callbacks:
+            callback(data)
+
+    def on_failed(self, url: str) -> None:
+        # Forgotten so the next fetch of the URL downloads it again
+        _, callbacks = self._pending.pop(url, (None, []))
+        for callback in callbacks:
+            callback(None)
+
+    def stop(self) -> None:
+        self.threadpool.clear()
+        self._pending = {}
@@ -0,0 +1,48 @@
+""" Recording of the raw frames received from the Discord RPC server
+
+One JSON object per line: {"t": seconds since the recording started,
+"frame": the frame as received}. benchmarks/replay.py plays them back.
+"""
+import json
+import logging
+import time
+
+
+class FrameRecorder:
+    """ Append every received frame to a JSONL file
+
+    Called in the thread receiving the frames. The file is line buffered,
+    CTRL+C kills the overlay without closing it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8", buffering=1)
+        self.started_at = time.perf_counter()
+        self.count = 0
+        logging.info("Recording the Discord frames to %s", path)
+
+    def record(self, message: str) -> None:
+        if self.file.closed:
+            return
+
+        line = json.dumps({"t": round(time.perf_counter() - self.started_at, 6), "frame": message})
+        self.file.write(line + "\n")
+        self.count += 1
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+            logging.info("Recorded %s frames to %s", self.count, self.path)
+
+
+def load_recording(path: str) -> list:
+    """ (seconds since the recording started, frame) list of a FrameRecorder file
+    """
+    frames = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                frames.append((entry["t"], entry["frame"]))
+    return frames
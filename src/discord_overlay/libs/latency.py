@@ -0,0 +1,59 @@
+import bisect
+
+# Upper bounds of the buckets, in milliseconds
+DEFAULT_LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class LatencyHistogram:
+    """ Histogram of the time between a frame arrival and the matching widget update
+    """
+
+    def __init__(self, buckets_ms: tuple = DEFAULT_LATENCY_BUCKETS_MS) -> None:
+        self.buckets_ms = buckets_ms
+        # The last bucket counts everything above the last bound
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float) -> None:
+        milliseconds = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, milliseconds)] += 1
+        self.count += 1
+        self.total_ms += milliseconds
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def percentile(self, percent: float) -> float:
+        """ Upper bound of the bucket holding the given percentile, in milliseconds
+        """
+        if not self.count:
+            return 0.0
+
+        threshold = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return self.buckets_ms[index] if index < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> str:
+        if not self.count:
+            return "no samples"
+
+        lines = [
+            f"{self.count} samples, mean {self.total_ms / self.count:.3f}ms, "
+            f"p50 <= {self.percentile(50)}ms, p99 <= {self.percentile(99)}ms, max {self.max_ms:.3f}ms"
+        ]
+        lower = 0
+        for bound, count in zip(self.buckets_ms + (float("inf"),), self.counts):
+            if count:
+                lines.append(f"  {lower:>6} - {bound:<6} ms: {count}")
+            lower = bound
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
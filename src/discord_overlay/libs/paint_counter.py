@@ -0,0 +1,35 @@
+import time
+
+
+class PaintCounter:
+    """ Paint events per widget, a widget repainting itself in a loop shows up
+    with a rate far above the speaking updates
+    """
+
+    def __init__(self) -> None:
+        self.counts = {}
+        self.started_at = time.perf_counter()
+
+    def record(self, key: str) -> None:
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def rates(self) -> dict:
+        """ Paint events per second for each key since the last reset
+        """
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        return {key: count / elapsed for key, count in self.counts.items()}
+
+    def summary(self) -> str:
+        rates = self.rates()
+        if not rates:
+            return "no paint events"
+
+        busiest = max(rates, key=rates.get)
+        return (
+            f"{sum(self.counts.values())} paint events, {len(rates)} widgets, "
+            f"mean {sum(rates.values()) / len(rates):.2f}/s, max {rates[busiest]:.2f}/s ({busiest})"
+        )
+
+    def reset(self) -> None:
+        self.counts = {}
+        self.started_at = time.perf_counter()
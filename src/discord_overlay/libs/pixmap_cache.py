@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QBrush, QColorConstants, QImage, QPainter, QPixmap
+
+SHAPE_SQUARE = "square"
+SHAPE_ROUND = "round"
+# Decoded, unscaled image, used to build the scaled entries
+SHAPE_SOURCE = "source"
+
+DEFAULT_PIXMAP_CACHE_MAX_ENTRIES = 512
+
+
+class PixmapCache:
+    """ Bounded LRU cache of decoded and scaled avatar pixmaps
+
+    Entries are keyed by (avatar_key, size, shape), so avatar bytes are decoded
+    once and every widget or toast showing the same avatar at the same size
+    shares the same pixmap.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_PIXMAP_CACHE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, avatar_key: str, data: bytes, size: int, shape: str = SHAPE_SQUARE) -> QPixmap:
+        key = (avatar_key, size, shape)
+        pixmap = self._entries.get(key)
+        if pixmap is not None:
+            self._entries.move_to_end(key)
+            return pixmap
+
+        if shape == SHAPE_SOURCE:
+            pixmap = QPixmap()
+            pixmap.loadFromData(data)
+        elif shape == SHAPE_ROUND:
+            pixmap = self._round(self.get(avatar_key, data, size, SHAPE_SQUARE), size)
+        else:
+            pixmap = self.get(avatar_key, data, 0, SHAPE_SOURCE).scaled(
+                size,
+                size,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+
+        self._entries[key] = pixmap
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return pixmap
+
+    def _round(self, square: QPixmap, size: int) -> QPixmap:
+        # Premultiplied ARGB is what the raster engine blends without conversion
+        image = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(QColorConstants.Transparent)
+        painter = QPainter(image)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setBrush(QBrush(square))
+        painter.drawEllipse(0, 0, size, size)
+        painter.end()
+        return QPixmap.fromImage(image)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,28 @@
+import random
+
+DEFAULT_RECONNECT_BASE_DELAY_MS = 1000
+DEFAULT_RECONNECT_MAX_DELAY_MS = 60000
+
+
+class ReconnectBackoff:
+    """ Jittered exponential backoff between reconnection attempts
+    """
+
+    def __init__(
+        self,
+        base_delay_ms: int = DEFAULT_RECONNECT_BASE_DELAY_MS,
+        max_delay_ms: int = DEFAULT_RECONNECT_MAX_DELAY_MS,
+    ) -> None:
+        self.base_delay_ms = base_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.attempt = 0
+
+    def next_delay(self) -> int:
+        delay = min(self.max_delay_ms, self.base_delay_ms * 2 ** self.attempt)
+        self.attempt += 1
+        # Keep at least half of the delay, randomize the rest so several
+        # overlays do not hammer the client at the same time
+        return int(delay / 2 + random.uniform(0, delay / 2))
+
+    def reset(self) -> None:
+        self.attempt = 0
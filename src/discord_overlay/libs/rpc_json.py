@@ -0,0 +1,61 @@
+""" Decoding of the frames received from the Discord RPC server
+
+orjson is used when installed, the standard json module otherwise.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson else "json"
+# orjson decodes a SPEAKING_* frame faster than classify_speaking_frame() looks at it
+CLASSIFY_SPEAKING_FRAMES = JSON_BACKEND == "json"
+
+# SPEAKING_* frames are tiny, anything bigger goes through the full decoding
+SPEAKING_FRAME_MAX_LENGTH = 512
+_SPEAKING_EVENT = '"evt":"SPEAKING_'
+_SPEAKING_EVENT_SUFFIXES = {'START"': "SPEAKING_START", 'STOP"': "SPEAKING_STOP"}
+_DISPATCH_CMD = '"cmd":"DISPATCH"'
+_USER_ID = '"user_id":"'
+
+
+def loads(message: str) -> dict:
+    if orjson:
+        return orjson.loads(message)
+    return json.loads(message)
+
+
+def classify_speaking_frame(message: str) -> tuple[str, str] | None:
+    """ Return (event, user_id) for SPEAKING_START/STOP frames without decoding them
+
+    Only the compact encoding sent by the Discord client is recognized; any
+    other frame returns None and must be decoded with loads(). Quotes inside
+    JSON strings are escaped, so these markers cannot match user provided
+    values.
+    """
+    if len(message) > SPEAKING_FRAME_MAX_LENGTH:
+        return None
+
+    index = message.find(_SPEAKING_EVENT)
+    if index < 0:
+        return None
+
+    index += len(_SPEAKING_EVENT)
+    event = _SPEAKING_EVENT_SUFFIXES.get(message[index:index + 6]) or \
+        _SPEAKING_EVENT_SUFFIXES.get(message[index:index + 5])
+    if not event or _DISPATCH_CMD not in message:
+        return None
+
+    start = message.find(_USER_ID)
+    if start < 0:
+        return None
+
+    start += len(_USER_ID)
+    end = message.find('"', start)
+    user_id = message[start:end]
+    if end < 0 or not user_id.isdigit():
+        return None
+
+    return event, user_id
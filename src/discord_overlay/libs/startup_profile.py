@@ -0,0 +1,42 @@
+import time
+
+
+class StartupProfile:
+    """ Time spent in each startup phase, enabled by --profile-startup
+
+    Every mark() ends the current phase, its duration is the time since the
+    previous mark. Marks are free until start() is called.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.started_at = 0.0
+        self.last_mark_at = 0.0
+        # (phase, seconds)
+        self.phases = []
+
+    def start(self, started_at: float = None) -> None:
+        self.enabled = True
+        self.started_at = self.last_mark_at = started_at or time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase: str) -> None:
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last_mark_at))
+        self.last_mark_at = now
+
+    def summary(self) -> str:
+        if not self.phases:
+            return "no phases"
+
+        lines = [f"{(self.last_mark_at - self.started_at) * 1000:.1f}ms until {self.phases[-1][0]}"]
+        for phase, seconds in self.phases:
+            lines.append(f"  {phase:<16} {seconds * 1000:>8.1f}ms")
+        return "\n".join(lines)
+
+
+# The phases span the script, the App and the Controller
+startup_profile = StartupProfile()
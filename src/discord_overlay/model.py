@@ -10,17 +10,80 @@ from .config import (
 )
 
 
+class VoiceUser:
+    """ What the overlay keeps of a voice channel member
+
+    The RPC voice state payloads carry a lot more, only the fields drawn by
+    the overlay are kept. speaking is never part of a payload, it is set by
+    the views from the SPEAKING_* events.
+    """
+    __slots__ = ("id", "nick", "avatar", "discriminator", "mute", "deaf", "speaking")
+
+    # The fields sent by Discord, see update()
+    RPC_FIELDS = ("nick", "avatar", "discriminator", "mute", "deaf")
+
+    def __init__(
+        self,
+        user_id: str,
+        nick: str,
+        avatar: str | None = None,
+        discriminator: str = "0",
+        mute: bool = False,
+        deaf: bool = False,
+    ) -> None:
+        self.id = user_id
+        self.nick = nick
+        self.avatar = avatar
+        self.discriminator = discriminator
+        self.mute = mute
+        self.deaf = deaf
+        self.speaking = False
+
+    @classmethod
+    def from_voice_state(cls, voice_state: dict) -> "VoiceUser":
+        user = voice_state["user"]
+        state = voice_state["voice_state"]
+        return cls(
+            user_id=user["id"],
+            nick=voice_state["nick"],
+            avatar=user.get("avatar"),
+            discriminator=user.get("discriminator") or "0",
+            mute=bool(state["mute"] or state["self_mute"]),
+            deaf=bool(state["deaf"] or state["self_deaf"]),
+        )
+
+    def update(self, user: "VoiceUser") -> bool:
+        """ Copy the fields sent by Discord from user, return whether any changed
+        """
+        changed = False
+        for field in self.RPC_FIELDS:
+            value = getattr(user, field)
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                changed = True
+        return changed
+
+    def __repr__(self) -> str:
+        return f"VoiceUser({self.id!r}, {self.nick!r})"
+
+
 class Model(QObject):
-    user_added_signal = pyqtSignal(dict)
+    # user_id, the VoiceUser lives in Model.users
+    user_added_signal = pyqtSignal(str)
     user_removed_signal = pyqtSignal(str)
-    user_changed_signal = pyqtSignal(dict)
+    user_changed_signal = pyqtSignal(str)
     users_emptied_signal = pyqtSignal()
+    # user_id list, every user was replaced at once
+    users_reset_signal = pyqtSignal(list)
+    # user_id list of the users still speaking when the connection dropped
+    speaking_lost_signal = pyqtSignal(list)
 
-    users = {}
     running_in_background_message_shown = False
 
     def __init__(self) -> None:
         super().__init__()
+        # user_id -> VoiceUser
+        self.users = {}
         self.basedir = Path(__file__).resolve()
         self.staticdir = Path(self.basedir) / ".." / STATIC_DIR_NAME
         self.imagedir = Path(self.staticdir) / IMAGES_DIR_NAME
@@ -35,10 +98,18 @@ class Model(QObject):
         self.users_changed()
         self.users_emptied_signal.emit()
 
-    def add_user(self, user: dict) -> None:
+    def reset_users(self, users: list) -> None:
+        """ Replace every user at once, the views rebuild in a single pass
+        """
+        logging.debug('Resetting users to %s users', len(users))
+        self.users = {user.id: user for user in users}
+        self.users_changed()
+        self.users_reset_signal.emit(list(self.users))
+
+    def add_user(self, user: VoiceUser) -> None:
         logging.debug('Adding user %s', user)
-        self.users[user.get('id')] = user
-        self.user_added_signal.emit(user)
+        self.users[user.id] = user
+        self.user_added_signal.emit(user.id)
 
     def delete_user(self, user_id: str) -> None:
         logging.debug('Deleting user %s', user_id)
@@ -50,5 +121,26 @@ class Model(QObject):
         self.users_changed()
         self.user_removed_signal.emit(user_id)
 
-    def change_user(self, user: dict) -> None:
-        self.user_changed_signal.emit(user)
+    def change_user(self, user: VoiceUser) -> None:
+        """ Update the stored user in place, nothing is emitted if nothing changed
+        """
+        if self.users[user.id].update(user):
+            self.user_changed_signal.emit(user.id)
+
+    def sync_users(self, users: list) -> None:
+        """ Apply a full roster, only touching the users that differ
+        """
+        roster = {user.id: user for user in users}
+        for user_id in [user_id for user_id in self.users if user_id not in roster]:
+            self.delete_user(user_id)
+
+        for user_id, user in roster.items():
+            if user_id not in self.users:
+                self.add_user(user)
+            else:
+                self.change_user(user)
+
+        # Their SPEAKING_STOP was lost with the connection, the views stop them
+        speaking = [user_id for user_id, user in self.users.items() if user.speaking]
+        if speaking:
+            self.speaking_lost_signal.emit(speaking)
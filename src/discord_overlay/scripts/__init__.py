@@ -2,11 +2,11 @@ import logging
 import os
 import signal
 import sys
+import time
 import click
 import pathlib
 
 from logging.handlers import RotatingFileHandler
-from discord_overlay.app import App
 
 
 # To manage CTRL+C from terminal
@@ -55,14 +55,30 @@ def create_logging_folder(log_file_path):
 
 @click.command()
 @click.option("--debug", is_flag=True, default=False)
-def main(debug=False):
+@click.option("--profile-startup", is_flag=True, default=False, help="Log the time spent in each startup phase")
+@click.option(
+    "--record-frames",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Record the frames received from Discord to this JSONL file, see benchmarks/replay.py",
+)
+def main(debug=False, profile_startup=False, record_frames=None):
     app_domain = "bashtian.fr"
     app_name = "discord-overlay"
     log_file_path = fr"%APPDATA%/{app_domain}/{app_name}.log"
 
     set_logger(debug, log_file_path)
 
-    app = App(organization_domain=app_domain, name=app_name)
+    # Imported here so the import time is part of the profile, and --help stays fast
+    started_at = time.perf_counter()
+    from discord_overlay.app import App
+    from discord_overlay.libs.startup_profile import startup_profile
+
+    if profile_startup:
+        startup_profile.start(started_at)
+        startup_profile.mark("imports")
+
+    app = App(organization_domain=app_domain, name=app_name, record_frames=record_frames)
     sys.exit(app.exec())
 
 
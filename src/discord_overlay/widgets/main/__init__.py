@@ -3,10 +3,11 @@ from PyQt6.QtCore import Qt, QPoint
 from PyQt6.QtGui import QIcon
 
 from .central import CentralWidget
+from .central.roster_view import RosterView
 from .central.scroll_area import CentralWidgetScrollArea
 from .footer import MainWindowFooter
 from .header import MainWindowHeaderWidget
-from ..settings import SettingsDialog
+from ...config import DEFAULT_ROSTER_VIEW, ROSTER_VIEW_PAINTED
 from ...controller import Controller
 
 
@@ -44,6 +45,10 @@ class MainWidget(QMainWindow):
         self._ui.footer.show()
 
     def toggle_settings(self) -> None:
+        if not self._ui.settings_dialog:
+            # Most sessions never open the settings, only build them when asked
+            self._ui.set_dialog()
+
         if self._ui.settings_dialog.isVisible():
             self._ui.settings_dialog.hide()
         else:
@@ -57,8 +62,8 @@ class MainWidget(QMainWindow):
 class MainWidgetUi:
     def setup_ui(self, main_widget: MainWidget) -> None:
         self.main_widget = main_widget
+        self.settings_dialog = None
         self.set_attributes()
-        self.set_dialog()
         self.set_central_widget()
         self.set_header()
         self.set_scroll_area()
@@ -81,6 +86,8 @@ class MainWidgetUi:
         self.main_widget.move(QPoint(20, 20))
 
     def set_dialog(self) -> None:
+        from ..settings import SettingsDialog
+
         self.settings_dialog = SettingsDialog(
             controller=self.main_widget.controller,
             parent=self.main_widget
@@ -99,7 +106,12 @@ class MainWidgetUi:
         self.centralwidget.layout().addWidget(self.header)
 
     def set_scroll_area(self) -> None:
-        self.scroll_area = CentralWidgetScrollArea(
+        roster_view = self.main_widget.controller.config.get(
+            "roster_view", type=str, default=DEFAULT_ROSTER_VIEW
+        )
+        # Both provide hide_border() and show_border()
+        roster_class = RosterView if roster_view == ROSTER_VIEW_PAINTED else CentralWidgetScrollArea
+        self.scroll_area = roster_class(
             controller=self.main_widget.controller,
             parent=self.centralwidget
         )
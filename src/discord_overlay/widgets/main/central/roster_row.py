@@ -0,0 +1,91 @@
+import time
+
+from ....libs.avatar_cache import avatar_cache_key, avatar_url
+from ....model import VoiceUser
+
+# Geometry of a row, shared by both views
+ROW_MARGIN = 4
+SPEAKER_BORDER_SIZE = 3
+
+
+class RosterRow:
+    """ State of a user in the roster, whether or not something draws it
+
+    The view owning the row is told about changes through update_row() and
+    set_row_hidden(). The speaking coalescer, the speaker hide scheduler and
+    the join/leave notifications of the controller only deal with rows.
+
+    user is the VoiceUser of the Model, updated in place by Model.change_user.
+    Rows loaded with the whole channel are not announced, only the users
+    joining afterwards are. A row whose avatar download failed is drawn
+    without avatar, retry_avatar() downloads it again.
+    """
+    __slots__ = (
+        "view", "user", "announce", "avatar_key", "avatar_url", "avatar_data", "avatar_failed", "shown_at", "hidden"
+    )
+
+    def __init__(self, view, user: VoiceUser, announce: bool = True) -> None:
+        self.view = view
+        self.user = user
+        self.announce = announce
+        self.avatar_key = avatar_cache_key(user)
+        self.avatar_url = avatar_url(user)
+        self.avatar_data = None
+        self.avatar_failed = False
+        self.shown_at = 0.0
+        self.hidden = False
+
+    @property
+    def speaking(self) -> bool:
+        return self.user.speaking
+
+    def get_avatar_size(self) -> int:
+        return self.view.controller.config.snapshot.user_avatar_size
+
+    def set_avatar(self) -> None:
+        avatar_data = self.view.controller.avatar_cache.get(self.avatar_key)
+        if avatar_data:
+            self.set_avatar_data(avatar_data)
+            return
+
+        self.avatar_failed = False
+        self.view.controller.avatar_fetcher.fetch(self.avatar_url, self.avatar_key, self.set_avatar_data)
+
+    def retry_avatar(self) -> None:
+        if self.avatar_failed:
+            self.set_avatar()
+
+    def cancel_avatar_fetch(self) -> None:
+        self.view.controller.avatar_fetcher.cancel(self.avatar_url, self.set_avatar_data)
+
+    def set_avatar_data(self, avatar_data: bytes | None) -> None:
+        if avatar_data is None:
+            self.avatar_failed = True
+        else:
+            self.avatar_data = avatar_data
+        if self.announce:
+            self.announce = False
+            self.view.controller.someone_joined_channel_notification(self)
+        self.view.update_row(self)
+
+    def start_speaking(self) -> None:
+        self.user.speaking = True
+        if self.hidden:
+            self.shown_at = time.perf_counter()
+            self.view.set_row_hidden(self, False)
+        self.view.update_row(self)
+
+    def stop_speaking(self) -> None:
+        """ The view hides the row later on, see SpeakerHideScheduler
+        """
+        self.user.speaking = False
+        self.view.update_row(self)
+
+    def hide(self) -> None:
+        self.view.set_row_hidden(self, True)
+
+    def is_user_deafen(self) -> bool:
+        return self.user.deaf
+
+    def is_user_mute(self) -> bool:
+        return self.user.mute and not self.user.deaf
@@ -0,0 +1,283 @@
+import logging
+
+from PyQt6.QtCore import QRect, QRectF, Qt, QTimer
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPaintEvent, QPen, QPixmap, QResizeEvent
+from PyQt6.QtWidgets import QAbstractScrollArea
+
+from ....controller import Controller
+from ....libs.pixmap_cache import SHAPE_ROUND
+from ....model import VoiceUser
+from .roster_row import ROW_MARGIN, SPEAKER_BORDER_SIZE, RosterRow
+from .speaking import SpeakerHideScheduler, SpeakingCoalescer
+
+ICON_SIZE = 20
+NICK_INDENT = 2
+
+
+class RosterPainter:
+    """ Paint a whole user row: avatar, speaker ring, mute/deafen icon and nickname
+    """
+
+    def __init__(self, controller: Controller) -> None:
+        self.controller = controller
+        self.mute_pixmap = self._icon("images:muted.png")
+        self.deafen_pixmap = self._icon("images:deafen.png")
+        self.update_style()
+
+    def _icon(self, path: str) -> QPixmap:
+        return QPixmap(path).scaled(
+            ICON_SIZE,
+            ICON_SIZE,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.FastTransformation,
+        )
+
+    def update_style(self) -> None:
+        """ Cache what paint() needs from the settings, called on every settings change
+        """
+        snapshot = self.controller.config.snapshot
+        self.avatar_size = snapshot.user_avatar_size
+        self.ring_size = self.avatar_size + SPEAKER_BORDER_SIZE * 2
+        self.ring_pen = QPen(QColor(snapshot.speaker_border_color), SPEAKER_BORDER_SIZE)
+        self.nick_color = QColor(snapshot.user_nickname_color)
+        self.nick_font = QFont()
+        self.nick_font.setPixelSize(snapshot.user_nickname_fontsize)
+        # Like ScrollAreaUserContainer.row_height(), a big font makes the row taller
+        self.row_height = max(self.ring_size, QFontMetrics(self.nick_font).height()) + ROW_MARGIN
+
+    def paint(self, painter: QPainter, rect: QRect, row: RosterRow) -> None:
+        ring_size = self.ring_size
+        ring = QRect(rect.x() + ROW_MARGIN, rect.y() + ROW_MARGIN, ring_size, ring_size)
+
+        painter.save()
+        if row.avatar_data:
+            avatar = self.controller.pixmap_cache.get(row.avatar_key, row.avatar_data, self.avatar_size, SHAPE_ROUND)
+            painter.drawPixmap(ring.x() + SPEAKER_BORDER_SIZE, ring.y() + SPEAKER_BORDER_SIZE, avatar)
+
+        if row.speaking:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(self.ring_pen)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            half = SPEAKER_BORDER_SIZE / 2
+            painter.drawEllipse(QRectF(ring).adjusted(half, half, -half, -half))
+
+        if row.is_user_deafen():
+            painter.drawPixmap(ring.right() + 1 - ICON_SIZE, ring.y(), self.deafen_pixmap)
+        elif row.is_user_mute():
+            painter.drawPixmap(ring.right() + 1 - ICON_SIZE, ring.bottom() + 1 - ICON_SIZE, self.mute_pixmap)
+
+        painter.setPen(self.nick_color)
+        painter.setFont(self.nick_font)
+        text_rect = QRect(
+            ring.right() + 1 + NICK_INDENT, ring.y(), rect.right() - ring.right(), self.row_height - ROW_MARGIN
+        )
+        painter.drawText(
+            text_rect,
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+            row.user.nick,
+        )
+        painter.restore()
+
+
+class RosterView(QAbstractScrollArea):
+    """ Alternative to CentralWidgetScrollArea painting every user in one widget
+
+    There is no widget nor item model per user: the viewport paints the
+    rows it shows, and a change only repaints the rect of its row. Rows are
+    kept like in the ScrollAreaUserContainer, so the speaking helpers drive
+    both.
+    """
+
+    def __init__(self, controller: Controller, parent=None) -> None:
+        super().__init__(parent=parent)
+        self.controller = controller
+        self.setObjectName(self.__class__.__name__)
+        self.show_border()
+        self.viewport().setAutoFillBackground(False)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.roster_painter = RosterPainter(controller=controller)
+
+        # Every user, the last one added first
+        self.rows = []
+        # Rows not hidden by the show only speakers mode, in display order
+        self.shown_rows = []
+        # user_id -> position in shown_rows
+        self.shown_positions = {}
+        # user_id -> RosterRow
+        self.rows_by_id = {}
+        self.speaking_coalescer = SpeakingCoalescer(self)
+        self.speaker_hide_scheduler = SpeakerHideScheduler(self)
+        # Any number of changes within an event loop iteration is laid out once
+        self.layout_timer = QTimer(self)
+        self.layout_timer.setSingleShot(True)
+        self.layout_timer.setInterval(0)
+        self.layout_timer.timeout.connect(self.layout_rows)
+        self.controller.settings_changed_signal.connect(self.on_settings_changed)
+        self.controller.model.users_emptied_signal.connect(self.on_users_emptied)
+        self.controller.model.users_reset_signal.connect(self.on_users_reset)
+        self.controller.model.user_added_signal.connect(self.on_user_added)
+        self.controller.model.user_removed_signal.connect(self.on_user_removed)
+        self.controller.model.user_changed_signal.connect(self.on_user_change)
+        self.controller.model.speaking_lost_signal.connect(self.on_speaking_lost)
+        self.controller.discord_connector.custom_signal_speaking_start.connect(self.on_speaking_start)
+        self.controller.discord_connector.custom_signal_speaking_stop.connect(self.on_speaking_stop)
+
+    def hide_border(self) -> None:
+        self.setStyleSheet(
+            """
+            #RosterView {
+                background: transparent;
+                border: none;
+            }
+        """
+        )
+
+    def show_border(self) -> None:
+        self.setStyleSheet(
+            """
+            #RosterView {
+                background: transparent;
+                border: none;
+                border-left: 1px dotted rgba(255,255,255, 0.5);
+                border-right: 1px dotted rgba(255,255,255, 0.5);
+            }
+        """
+        )
+
+    def schedule_layout(self) -> None:
+        if not self.layout_timer.isActive():
+            self.layout_timer.start()
+
+    def layout_rows(self) -> None:
+        """ Index the shown rows, size the scroll bar for them and repaint
+        """
+        self.layout_timer.stop()
+        self.shown_rows = [row for row in self.rows if not row.hidden]
+        self.shown_positions = {row.user.id: position for position, row in enumerate(self.shown_rows)}
+        self.update_scroll_bar()
+        self.viewport().update()
+
+    def update_scroll_bar(self) -> None:
+        row_height = self.roster_painter.row_height
+        viewport_height = self.viewport().height()
+        scroll_bar = self.verticalScrollBar()
+        scroll_bar.setSingleStep(row_height)
+        scroll_bar.setPageStep(viewport_height)
+        scroll_bar.setRange(0, max(0, len(self.shown_rows) * row_height - viewport_height))
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        super().resizeEvent(event)
+        self.update_scroll_bar()
+
+    def scrollContentsBy(self, dx: int, dy: int) -> None:
+        self.viewport().update()
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        if not self.shown_rows:
+            return
+
+        row_height = self.roster_painter.row_height
+        top = self.verticalScrollBar().value()
+        rect = event.rect()
+        first = max(0, (top + rect.top()) // row_height)
+        last = min(len(self.shown_rows), (top + rect.bottom()) // row_height + 1)
+        width = self.viewport().width()
+        painter = QPainter(self.viewport())
+        for position in range(first, last):
+            row_rect = QRect(0, position * row_height - top, width, row_height)
+            self.roster_painter.paint(painter, row_rect, self.shown_rows[position])
+        painter.end()
+
+    def update_row(self, row: RosterRow) -> None:
+        if self.layout_timer.isActive():
+            # The whole viewport is repainted by the pending layout
+            return
+
+        position = self.shown_positions.get(row.user.id)
+        if position is None:
+            return
+
+        row_height = self.roster_painter.row_height
+        y = position * row_height - self.verticalScrollBar().value()
+        if -row_height < y < self.viewport().height():
+            self.viewport().update(0, y, self.viewport().width(), row_height)
+
+    def set_row_hidden(self, row: RosterRow, hidden: bool) -> None:
+        row.hidden = hidden
+        self.schedule_layout()
+
+    def on_speaking_start(self, user_id: str, received_at: float) -> None:
+        self.speaking_coalescer.push(user_id, True, received_at)
+
+    def on_speaking_stop(self, user_id: str, received_at: float) -> None:
+        self.speaking_coalescer.push(user_id, False, received_at)
+
+    def on_speaking_lost(self, user_ids: list) -> None:
+        self.speaking_coalescer.stop(user_ids)
+
+    def on_settings_changed(self, setting_name: str) -> None:
+        if setting_name == "show_only_speakers":
+            self.speaker_hide_scheduler.clear()
+            show_only_speakers = self.controller.config.snapshot.show_only_speakers
+            for row in self.rows:
+                row.hidden = show_only_speakers and not row.speaking
+            return self.schedule_layout()
+
+        if setting_name.startswith("user_") or setting_name.startswith("speaker_"):
+            self.roster_painter.update_style()
+            # The row height may have changed
+            self.schedule_layout()
+
+    def add_user(self, user: VoiceUser, announce: bool = True) -> None:
+        row = RosterRow(self, user, announce=announce)
+        row.hidden = self.controller.config.snapshot.show_only_speakers
+        self.rows_by_id[user.id] = row
+        self.rows.insert(0, row)
+        self.schedule_layout()
+        row.set_avatar()
+
+    def on_users_emptied(self) -> None:
+        self.remove_users()
+
+    def on_users_reset(self, user_ids: list) -> None:
+        # Nothing is laid out before the layout timer fires, once for all the rows
+        self.remove_users()
+        users = self.controller.model.users
+        for user_id in user_ids:
+            self.add_user(users[user_id], announce=False)
+
+    def on_user_added(self, user_id: str) -> None:
+        user = self.controller.model.users[user_id]
+        logging.debug(f"Adding user to UI {user}")
+        self.add_user(user)
+
+    def on_user_removed(self, user_id: str) -> None:
+        self.remove_users(user_id=user_id, send_toast=True)
+
+    def on_user_change(self, user_id: str) -> None:
+        row = self.rows_by_id.get(user_id)
+        if not row:
+            logging.warning("No row for user %s", user_id)
+            return
+        self.update_row(row)
+        row.retry_avatar()
+
+    def remove_users(self, user_id: str = None, send_toast=False) -> None:
+        logging.debug(f"Removing users: {user_id}")
+        if user_id:
+            self.speaker_hide_scheduler.cancel(user_id)
+            rows = [self.rows_by_id.pop(user_id)] if user_id in self.rows_by_id else []
+            for row in rows:
+                self.rows.remove(row)
+        else:
+            self.speaker_hide_scheduler.clear()
+            rows = self.rows
+            self.rows = []
+            self.rows_by_id = {}
+
+        for row in rows:
+            self.controller.someone_left_channel_notification(row, send_toast=send_toast)
+            row.cancel_avatar_fetch()
+
+        self.schedule_layout()
@@ -1,10 +1,23 @@
 import logging
 
-from PyQt6.QtCore import Qt, QThreadPool, pyqtSignal
-from PyQt6.QtWidgets import QScrollArea, QVBoxLayout, QWidget
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPalette, QResizeEvent
+from PyQt6.QtWidgets import QScrollArea, QWidget
 
 from ....controller import Controller
+from ....model import VoiceUser
 from ...user import UserWidget
+from .roster_row import ROW_MARGIN, SPEAKER_BORDER_SIZE, RosterRow
+from .speaking import SpeakerHideScheduler, SpeakingCoalescer
+
+# Settings applied through the palette and font shared by every user widget
+USER_CONTAINER_STYLE_SETTINGS = (
+    "user_nickname_color",
+    "user_nickname_fontsize",
+    "speaker_border_color",
+)
+# Rows materialized above and below the viewport
+OVERSCAN_ROWS = 4
 
 
 class CentralWidgetScrollArea(QScrollArea):
@@ -29,6 +42,11 @@ class CentralWidgetScrollArea(QScrollArea):
         self.user_container = ScrollAreaUserContainer(controller=self.controller, parent=self)
         self.setWidget(self.user_container)
 
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        super().resizeEvent(event)
+        # A taller viewport shows more rows without resizing the container
+        self.user_container.schedule_layout()
+
     def hide_border(self) -> None:
         self.setStyleSheet(
             """
@@ -53,7 +71,12 @@ class CentralWidgetScrollArea(QScrollArea):
 
 
 class ScrollAreaUserContainer(QWidget):
-    toggle_widgets_signal = pyqtSignal()
+    """ Users list of the CentralWidgetScrollArea
+
+    Every user is a RosterRow, only the rows inside the viewport plus
+    OVERSCAN_ROWS on each side get a UserWidget. Widgets of rows scrolled out
+    of view are recycled for the rows scrolled in.
+    """
 
     def __init__(self, controller: Controller, parent) -> None:
         super().__init__(parent=parent)
@@ -68,53 +91,211 @@ class ScrollAreaUserContainer(QWidget):
         )
         self.controller.settings_changed_signal.connect(self.on_settings_changed)
         self.controller.model.users_emptied_signal.connect(self.on_users_emptied)
+        self.controller.model.users_reset_signal.connect(self.on_users_reset)
         self.controller.model.user_added_signal.connect(self.on_user_added)
         self.controller.model.user_removed_signal.connect(self.on_user_removed)
         self.controller.model.user_changed_signal.connect(self.on_user_change)
-        self.threadpool = QThreadPool(self)
-        self.init_ui()
+        self.controller.model.speaking_lost_signal.connect(self.on_speaking_lost)
+        self.controller.discord_connector.custom_signal_speaking_start.connect(self.on_speaking_start)
+        self.controller.discord_connector.custom_signal_speaking_stop.connect(self.on_speaking_stop)
+        # Every user, the last one added first
+        self.rows = []
+        # Rows not hidden by the show only speakers mode, in display order
+        self.shown_rows = []
+        # user_id -> RosterRow
+        self.rows_by_id = {}
+        # user_id -> UserWidget of the materialized rows
+        self.bound_widgets = {}
+        self.free_widgets = []
+        self.speaking_coalescer = SpeakingCoalescer(self)
+        self.speaker_hide_scheduler = SpeakerHideScheduler(self)
+        self.user_palette = QPalette()
+        self.user_font = QFont()
+        self.update_style()
+        # Any number of changes within an event loop iteration is laid out once
+        self.layout_timer = QTimer(self)
+        self.layout_timer.setSingleShot(True)
+        self.layout_timer.setInterval(0)
+        self.layout_timer.timeout.connect(self.layout_rows)
 
-    def init_ui(self) -> None:
-        layout = QVBoxLayout()
-        layout.setDirection(QVBoxLayout.Direction.BottomToTop)
-        layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(0)
-        self.setLayout(layout)
-
-    def on_user_change(self, user_data: dict) -> None:
-        user_widget = self.get_user_widget(user_data.get("id"))
-        user_widget.update_data(user_data)
-
-    def get_user_widget(self, user_id) -> UserWidget:
-        for i in reversed(range(self.layout().count())):
-            widget = self.layout().itemAt(i).widget()
-            if widget.user_data.get("id") == user_id:
-                return widget
+    def row_height(self) -> int:
+        ring_size = self.controller.config.snapshot.user_avatar_size + SPEAKER_BORDER_SIZE * 2
+        return max(ring_size, QFontMetrics(self.user_font).height()) + ROW_MARGIN
+
+    def schedule_layout(self) -> None:
+        if not self.layout_timer.isActive():
+            self.layout_timer.start()
+
+    def layout_rows(self) -> None:
+        """ Size the container for every shown row and bind widgets to the visible ones
+        """
+        self.layout_timer.stop()
+        self.shown_rows = [row for row in self.rows if not row.hidden]
+        row_height = self.row_height()
+        self.setMinimumHeight(len(self.shown_rows) * row_height)
+        self.update_viewport()
+
+    def update_viewport(self) -> None:
+        row_height = self.row_height()
+        viewport = self.parentWidget()
+        viewport_height = viewport.height() if viewport else self.height()
+        # The scroll area moves the container up when scrolling down
+        top = max(0, -self.y())
+        first = max(0, top // row_height - OVERSCAN_ROWS)
+        last = min(len(self.shown_rows), (top + viewport_height) // row_height + 1 + OVERSCAN_ROWS)
+        visible_rows = self.shown_rows[first:last]
+
+        visible_ids = {row.user.id for row in visible_rows}
+        for user_id in [user_id for user_id in self.bound_widgets if user_id not in visible_ids]:
+            widget = self.bound_widgets.pop(user_id)
+            widget.hide()
+            self.free_widgets.append(widget)
+
+        for position, row in enumerate(visible_rows, first):
+            user_id = row.user.id
+            widget = self.bound_widgets.get(user_id)
+            if widget is None:
+                widget = self.get_free_widget(row)
+                self.bound_widgets[user_id] = widget
+            widget.setGeometry(0, position * row_height, self.width(), row_height)
+            widget.show()
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            self.check_rows_index()
+
+    def check_rows_index(self) -> bool:
+        """ Check that rows, rows_by_id, shown_rows and the bound widgets agree
+        """
+        errors = []
+        if len(self.rows_by_id) != len(self.rows) or any(
+            self.rows_by_id.get(row.user.id) is not row for row in self.rows
+        ):
+            errors.append(f"index={sorted(self.rows_by_id)} rows={sorted(row.user.id for row in self.rows)}")
+
+        # shown_rows is only refreshed by the pending layout
+        if not self.layout_timer.isActive():
+            shown_rows = [row for row in self.rows if not row.hidden]
+            if len(shown_rows) != len(self.shown_rows) or any(
+                row is not shown_row for row, shown_row in zip(shown_rows, self.shown_rows)
+            ):
+                errors.append(
+                    f"shown={[row.user.id for row in self.shown_rows]} expected={[row.user.id for row in shown_rows]}"
+                )
+
+            shown_ids = {row.user.id for row in self.shown_rows}
+            for user_id, widget in self.bound_widgets.items():
+                if user_id not in shown_ids or widget.row is not self.rows_by_id.get(user_id):
+                    errors.append(f"widget bound to {user_id} shows {widget.row.user.id}")
+
+        if any(widget in self.free_widgets for widget in self.bound_widgets.values()):
+            errors.append("a widget is both bound and free")
+
+        for error in errors:
+            logging.error("Users list out of sync: %s", error)
+        return not errors
+
+    def get_free_widget(self, row: RosterRow) -> UserWidget:
+        if self.free_widgets:
+            widget = self.free_widgets.pop()
+            widget.bind(row)
+            return widget
+
+        widget = UserWidget(controller=self.controller, row=row, parent=self)
+        widget.set_style(self.user_palette, self.user_font)
+        return widget
+
+    def moveEvent(self, event) -> None:
+        super().moveEvent(event)
+        self.update_viewport()
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        super().resizeEvent(event)
+        self.update_viewport()
+
+    def update_row(self, row: RosterRow) -> None:
+        widget = self.bound_widgets.get(row.user.id)
+        if widget:
+            widget.refresh()
+
+    def set_row_hidden(self, row: RosterRow, hidden: bool) -> None:
+        row.hidden = hidden
+        self.schedule_layout()
+
+    def on_user_change(self, user_id: str) -> None:
+        row = self.rows_by_id.get(user_id)
+        if not row:
+            logging.warning("No row for user %s", user_id)
+            return
+        self.update_row(row)
+        row.retry_avatar()
+
+    def on_speaking_start(self, user_id: str, received_at: float) -> None:
+        self.speaking_coalescer.push(user_id, True, received_at)
+
+    def on_speaking_stop(self, user_id: str, received_at: float) -> None:
+        self.speaking_coalescer.push(user_id, False, received_at)
+
+    def on_speaking_lost(self, user_ids: list) -> None:
+        self.speaking_coalescer.stop(user_ids)
 
     def on_settings_changed(self, setting_name: str) -> None:
         if setting_name == "show_only_speakers":
-            return self.toggle_widgets_signal.emit()
+            self.speaker_hide_scheduler.clear()
+            show_only_speakers = self.controller.config.snapshot.show_only_speakers
+            for row in self.rows:
+                row.hidden = show_only_speakers and not row.speaking
+            return self.schedule_layout()
 
-        if setting_name.startswith("user_") or setting_name.startswith("speaker_"):
-            for i in reversed(range(self.layout().count())):
-                widget: UserWidget = self.layout().itemAt(i).widget()
+        if setting_name in USER_CONTAINER_STYLE_SETTINGS:
+            self.update_style()
+
+        if setting_name == "user_avatar_size":
+            for widget in self.bound_widgets.values():
+                widget.update_setting(setting_name)
+            for widget in self.free_widgets:
                 widget.update_setting(setting_name)
 
-    def add_user(self, user) -> None:
-        user_widget = UserWidget(
-            controller=self.controller,
-            user_data=user,
-            parent=self,
-        )
+        if setting_name in ("user_avatar_size", "user_nickname_fontsize"):
+            # Row height changed
+            self.schedule_layout()
+
+    def update_style(self) -> None:
+        """ Build the palette and font of the user widgets and apply them
+
+        Widgets styled by a stylesheet do not inherit them from their parent,
+        so they are set on each user widget, without any stylesheet parse.
+        """
+        snapshot = self.controller.config.snapshot
+        self.user_palette = QPalette(self.user_palette)
+        self.user_palette.setColor(QPalette.ColorRole.WindowText, QColor(snapshot.user_nickname_color))
+        # Used by UserWidgetSpeakerBorder
+        self.user_palette.setColor(QPalette.ColorRole.Highlight, QColor(snapshot.speaker_border_color))
+        self.user_font = QFont(self.user_font)
+        self.user_font.setPixelSize(snapshot.user_nickname_fontsize)
+
+        for widget in list(self.bound_widgets.values()) + self.free_widgets:
+            widget.set_style(self.user_palette, self.user_font)
 
-        self.toggle_widgets_signal.connect(user_widget.toggle)
-        self.layout().addWidget(user_widget)
+    def add_user(self, user: VoiceUser, announce: bool = True) -> None:
+        row = RosterRow(self, user, announce=announce)
+        row.hidden = self.controller.config.snapshot.show_only_speakers
+        self.rows_by_id[user.id] = row
+        self.rows.insert(0, row)
+        self.schedule_layout()
+        row.set_avatar()
 
     def on_users_emptied(self) -> None:
         self.remove_users()
 
-    def on_user_added(self, user: dict) -> None:
+    def on_users_reset(self, user_ids: list) -> None:
+        # Nothing is laid out before the layout timer fires, once for all the rows
+        self.remove_users()
+        users = self.controller.model.users
+        for user_id in user_ids:
+            self.add_user(users[user_id], announce=False)
+
+    def on_user_added(self, user_id: str) -> None:
+        user = self.controller.model.users[user_id]
         logging.debug(f"Adding user to UI {user}")
         self.add_user(user)
 
@@ -123,11 +304,20 @@ class ScrollAreaUserContainer(QWidget):
 
     def remove_users(self, user_id: str = None, send_toast=False) -> None:
         logging.debug(f"Removing users: {user_id}")
-        for i in reversed(range(self.layout().count())):
-            widget = self.layout().itemAt(i).widget()
-            if not user_id or widget.user_data.get("id") == user_id:
-                self.controller.someone_left_channel_notification(widget, send_toast=send_toast)
-                self.layout().removeWidget(widget)
-                if widget:
-                    widget.setParent(None)
+        if user_id:
+            self.speaker_hide_scheduler.cancel(user_id)
+            rows = [self.rows_by_id.pop(user_id)] if user_id in self.rows_by_id else []
+            for row in rows:
+                self.rows.remove(row)
+        else:
+            self.speaker_hide_scheduler.clear()
+            rows = self.rows
+            self.rows = []
+            self.rows_by_id = {}
+
+        for row in rows:
+            self.controller.someone_left_channel_notification(row, send_toast=send_toast)
+            row.cancel_avatar_fetch()
+
+        self.schedule_layout()
         logging.debug("Finished removing user")
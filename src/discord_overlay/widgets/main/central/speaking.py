@@ -0,0 +1,159 @@
+import math
+import time
+from typing import TYPE_CHECKING
+
+from PyQt6.QtCore import QObject, QTimer
+
+if TYPE_CHECKING:
+    from .roster_row import RosterRow
+    from .scroll_area import ScrollAreaUserContainer
+
+# One display frame at 60Hz
+SPEAKING_COALESCE_INTERVAL_MS = 16
+# Resolution and size of the hide scheduler wheel: 64 * 50ms = 3.2s per turn
+SPEAKER_HIDE_TICK_MS = 50
+SPEAKER_HIDE_WHEEL_SLOTS = 64
+
+
+class SpeakingCoalescer(QObject):
+    """ Collect speaking transitions and apply their net state once per frame
+
+    A start/stop pair received within the same frame cancels out and never
+    touches the row, so crosstalk costs one relayout per frame at most.
+    """
+
+    def __init__(
+        self, container: "ScrollAreaUserContainer", interval_ms: int = SPEAKING_COALESCE_INTERVAL_MS
+    ) -> None:
+        super().__init__(parent=container)
+        self.container = container
+        # user_id -> (speaking, time.perf_counter() of the first pending frame)
+        self.pending = {}
+        self.applied = 0
+        self.dropped = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def push(self, user_id: str, speaking: bool, received_at: float) -> None:
+        first_received_at = self.pending.get(user_id, (None, received_at))[1]
+        self.pending[user_id] = (speaking, first_received_at)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+
+        # Rows only update themselves, their layout is batched by the container
+        pending, self.pending = self.pending, {}
+        for user_id, (speaking, received_at) in pending.items():
+            row = self.container.rows_by_id.get(user_id)
+            if not row or row.speaking == speaking:
+                self.dropped += 1
+                continue
+
+            if speaking:
+                self.container.speaker_hide_scheduler.cancel(user_id)
+                row.start_speaking()
+            else:
+                row.stop_speaking()
+                self.container.speaker_hide_scheduler.schedule_hide(row)
+            self.applied += 1
+            self.container.controller.latency_histogram.record(time.perf_counter() - received_at)
+
+    def stop(self, user_ids: list) -> None:
+        """ Stop the speakers right away, dropping their pending transitions
+        """
+        for user_id in user_ids:
+            self.pending.pop(user_id, None)
+            row = self.container.rows_by_id.get(user_id)
+            if row and row.speaking:
+                row.stop_speaking()
+                self.container.speaker_hide_scheduler.schedule_hide(row)
+
+    def clear(self) -> None:
+        self.timer.stop()
+        self.pending = {}
+
+
+class SpeakerHideScheduler(QObject):
+    """ Hide silent speakers after a hold time, for the show only speakers mode
+
+    Discord sends a stop/start pair between words, hiding the row right
+    away would reflow the list several times per second. A speaker stays
+    visible for the hold time after its last SPEAKING_STOP, and at least the
+    minimum visible time after being shown.
+
+    Every pending hide lives in a single timer wheel driven by one QTimer,
+    which only runs while something is scheduled.
+    """
+
+    def __init__(
+        self,
+        container: "ScrollAreaUserContainer",
+        tick_ms: int = SPEAKER_HIDE_TICK_MS,
+        slots: int = SPEAKER_HIDE_WHEEL_SLOTS,
+    ) -> None:
+        super().__init__(parent=container)
+        self.container = container
+        self.tick_ms = tick_ms
+        self.wheel = [set() for _ in range(slots)]
+        self.tick = 0
+        # user_id -> tick at which the row is hidden
+        self.deadlines = {}
+        self.timer = QTimer(self)
+        self.timer.setInterval(tick_ms)
+        self.timer.timeout.connect(self.advance)
+
+    def schedule_hide(self, row: "RosterRow") -> None:
+        snapshot = self.container.controller.config.snapshot
+        if not snapshot.show_only_speakers:
+            return
+
+        hold_ms = snapshot.show_only_speakers_hold_ms
+        min_visible_ms = snapshot.show_only_speakers_min_visible_ms
+        visible_ms = (time.perf_counter() - row.shown_at) * 1000
+        delay_ms = max(hold_ms, min_visible_ms - visible_ms)
+        if delay_ms <= 0:
+            self.cancel(row.user.id)
+            row.hide()
+            return
+
+        self.schedule(row.user.id, delay_ms)
+
+    def schedule(self, user_id: str, delay_ms: float) -> None:
+        self.cancel(user_id)
+        deadline = self.tick + max(1, math.ceil(delay_ms / self.tick_ms))
+        self.deadlines[user_id] = deadline
+        self.wheel[deadline % len(self.wheel)].add(user_id)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def cancel(self, user_id: str) -> None:
+        deadline = self.deadlines.pop(user_id, None)
+        if deadline is not None:
+            self.wheel[deadline % len(self.wheel)].discard(user_id)
+
+    def advance(self) -> None:
+        self.tick += 1
+        slot = self.wheel[self.tick % len(self.wheel)]
+        # Entries more than one turn away stay in the slot until their turn
+        due = [user_id for user_id in slot if self.deadlines[user_id] <= self.tick]
+        # hide() goes through set_row_hidden(), the container lays the rows out once
+        for user_id in due:
+            slot.discard(user_id)
+            del self.deadlines[user_id]
+            row = self.container.rows_by_id.get(user_id)
+            if row and not row.speaking:
+                row.hide()
+
+        if not self.deadlines:
+            self.timer.stop()
+
+    def clear(self) -> None:
+        self.timer.stop()
+        for slot in self.wheel:
+            slot.clear()
+        self.deadlines = {}
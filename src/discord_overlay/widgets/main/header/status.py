@@ -38,6 +38,13 @@ class MainWidgetHeaderConnStatusWidget(QLabel):
             self.anim.start()
             self.set_background_color('red')
 
+        if status == "RECONNECTING":
+            self.setToolTip(
+                f"Reconnecting (attempt {self.controller.reconnect_backoff.attempt})..."
+            )
+            self.anim.start()
+            self.set_background_color('orange')
+
         if status == "OK":
             self.setToolTip("Connected")
             self.set_background_color('green')
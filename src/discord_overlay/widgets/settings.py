@@ -24,6 +24,15 @@ from PyQt6.QtGui import (
     QPixmap,
     QColor,
     QMouseEvent,
+    QStandardItem,
+    QStandardItemModel,
+)
+from ..config import (
+    DEFAULT_ROSTER_VIEW,
+    DEFAULT_SPEAKER_HOLD_MS,
+    DEFAULT_SPEAKER_MIN_VISIBLE_MS,
+    ROSTER_VIEW_PAINTED,
+    ROSTER_VIEW_WIDGETS,
 )
 from ..controller import Controller
 from ..libs.css import EXTENDED_COLORS
@@ -43,6 +52,8 @@ class SettingsDialog(QDialog):
         self.setMinimumWidth(200)
         self.setWindowIcon(QIcon("images:icon.png"))
         self.old_pos = self.pos()
+        # Shared by the color comboboxes
+        self.color_model = self._get_color_model()
         self.init_ui()
         self.center()
         QShortcut("Ctrl+w", self).activated.connect(self.hide)
@@ -78,6 +89,9 @@ class SettingsDialog(QDialog):
         self.add_user_nickname_font_size(group_box)
         self.add_user_nickname_color(group_box)
         self.add_user_avater_size(group_box)
+        self.add_only_speakers_hold(group_box)
+        self.add_only_speakers_min_visible(group_box)
+        self.add_roster_view_combobox(group_box)
 
     def add_user_avater_size(self, group_box: QGroupBox) -> None:
         user_avater_size = QSpinBox(parent=group_box)
@@ -91,11 +105,56 @@ class SettingsDialog(QDialog):
         group_box.layout().addWidget(label, 6, 0)
         group_box.layout().addWidget(user_avater_size, 6, 1)
 
+    def add_only_speakers_hold(self, group_box: QGroupBox) -> None:
+        only_speakers_hold = QSpinBox(parent=group_box)
+        only_speakers_hold.setToolTip("How long a user stays visible after they stop speaking")
+        only_speakers_hold.setRange(0, 10000)
+        only_speakers_hold.setSingleStep(100)
+        only_speakers_hold.setSuffix(" ms")
+        hold_ms = self.controller.config.get(
+            "show_only_speakers_hold_ms", type=int, default=DEFAULT_SPEAKER_HOLD_MS
+        )
+        only_speakers_hold.setValue(hold_ms)
+
+        only_speakers_hold.valueChanged.connect(self.only_speakers_hold_callback)
+        label = QLabel(text="Speakers hold time:", parent=group_box)
+        group_box.layout().addWidget(label, 7, 0)
+        group_box.layout().addWidget(only_speakers_hold, 7, 1)
+
+    def add_only_speakers_min_visible(self, group_box: QGroupBox) -> None:
+        only_speakers_min_visible = QSpinBox(parent=group_box)
+        only_speakers_min_visible.setToolTip("Minimum time a speaker stays visible once shown")
+        only_speakers_min_visible.setRange(0, 10000)
+        only_speakers_min_visible.setSingleStep(100)
+        only_speakers_min_visible.setSuffix(" ms")
+        min_visible_ms = self.controller.config.get(
+            "show_only_speakers_min_visible_ms", type=int, default=DEFAULT_SPEAKER_MIN_VISIBLE_MS
+        )
+        only_speakers_min_visible.setValue(min_visible_ms)
+
+        only_speakers_min_visible.valueChanged.connect(self.only_speakers_min_visible_callback)
+        label = QLabel(text="Speakers minimum visible time:", parent=group_box)
+        group_box.layout().addWidget(label, 8, 0)
+        group_box.layout().addWidget(only_speakers_min_visible, 8, 1)
+
+    def add_roster_view_combobox(self, group_box: QGroupBox) -> None:
+        roster_view_combobox = QComboBox(parent=group_box)
+        roster_view_combobox.setToolTip(
+            "Painted draws every user in a single widget instead of a widget per visible user. "
+            "Applied on the next start"
+        )
+        roster_view_combobox.addItems([ROSTER_VIEW_WIDGETS, ROSTER_VIEW_PAINTED])
+        roster_view = self.controller.config.get("roster_view", type=str, default=DEFAULT_ROSTER_VIEW)
+        roster_view_combobox.setCurrentText(roster_view)
+        roster_view_combobox.currentTextChanged.connect(self.roster_view_combobox_callback)
+        label = QLabel(text="Users list:", parent=group_box)
+        group_box.layout().addWidget(label, 9, 0)
+        group_box.layout().addWidget(roster_view_combobox, 9, 1)
+
     def add_user_nickname_color(self, group_box: QGroupBox) -> None:
         user_nickname_color = QComboBox(parent=group_box)
         user_nickname_color.setToolTip("The border color of the user that speak")
-        for color, icon in self._get_color_list_width_icon().items():
-            user_nickname_color.addItem(icon, color)
+        user_nickname_color.setModel(self.color_model)
 
         nickname_color = self.controller.config.get("user_nickname_color", type=str, default="white")
         user_nickname_color.setCurrentText(nickname_color)
@@ -117,21 +176,18 @@ class SettingsDialog(QDialog):
         group_box.layout().addWidget(label, 3, 0)
         group_box.layout().addWidget(user_nickname_font_size, 3, 1)
 
-    def _get_color_list_width_icon(self) -> dict:
-        colors = {}
-
+    def _get_color_model(self) -> QStandardItemModel:
+        color_model = QStandardItemModel(self)
+        pixmap = QPixmap(15, 15)
         for color in EXTENDED_COLORS:
-            pixmap = QPixmap(15, 15)
             pixmap.fill(QColor(color))
-            icon = QIcon(pixmap)
-            colors[color] = icon
-        return colors
+            color_model.appendRow(QStandardItem(QIcon(pixmap), color))
+        return color_model
 
     def add_speaker_border_color_combobox(self, group_box: QGroupBox) -> None:
         speaker_border_color_combobox = QComboBox(parent=group_box)
         speaker_border_color_combobox.setToolTip("The border color of the user that speak")
-        for color, icon in self._get_color_list_width_icon().items():
-            speaker_border_color_combobox.addItem(icon, color)
+        speaker_border_color_combobox.setModel(self.color_model)
 
         border_color = self.controller.config.get("speaker_border_color", type=str, default="green")
         speaker_border_color_combobox.setCurrentText(border_color)
@@ -171,6 +227,18 @@ class SettingsDialog(QDialog):
         self.controller.config.set("show_only_speakers", is_checked)
         self.controller.settings_changed_signal.emit("show_only_speakers")
 
+    def only_speakers_hold_callback(self, value: int) -> None:
+        self.controller.config.set("show_only_speakers_hold_ms", value)
+        self.controller.settings_changed_signal.emit("show_only_speakers_hold_ms")
+
+    def only_speakers_min_visible_callback(self, value: int) -> None:
+        self.controller.config.set("show_only_speakers_min_visible_ms", value)
+        self.controller.settings_changed_signal.emit("show_only_speakers_min_visible_ms")
+
+    def roster_view_combobox_callback(self, text: str) -> None:
+        self.controller.config.set("roster_view", text)
+        self.controller.settings_changed_signal.emit("roster_view")
+
     def user_nickname_color_callback(self, text: str) -> None:
         self.controller.config.set("user_nickname_color", text)
         self.controller.settings_changed_signal.emit("user_nickname_color")
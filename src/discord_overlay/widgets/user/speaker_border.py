@@ -0,0 +1,25 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QPainter, QPalette, QPen
+from PyQt6.QtWidgets import QWidget
+
+
+class UserWidgetSpeakerBorder(QWidget):
+    """ Ring drawn around the avatar of a speaking user
+
+    The color is the Highlight role of the palette shared by the
+    ScrollAreaUserContainer, a color change costs no stylesheet parse.
+    """
+
+    def __init__(self, border_size: int, parent=None) -> None:
+        super().__init__(parent=parent)
+        self.border_size = border_size
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+
+    def paintEvent(self, event=None) -> None:
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(self.palette().color(QPalette.ColorRole.Highlight), self.border_size))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        half = self.border_size / 2
+        painter.drawEllipse(self.rect().toRectF().adjusted(half, half, -half, -half))